@@ -0,0 +1,147 @@
+from concurrent.futures import ThreadPoolExecutor
+from flow import run_dag
+from nodes import RepoAnalyzerNode, WebContextNode, BlogContextNode, BlogDraftGeneratorNode
+from utils.pr_creator import load_preferences
+from utils.checkpoint import RunCheckpoint
+import datetime
+import hashlib
+import json
+import os
+import re
+import threading
+import traceback
+
+BATCH_STATUS_DIR = os.environ.get("BATCH_STATUS_DIR", "batch_runs")
+
+def load_manifest(manifest_path):
+    """
+    Read a JSONL manifest: one job per line with repo_url plus any of the blog prompts
+    (notes, extra, series, is_new_series, emotions, takeaway, anecdotes, opening_line,
+    system_prompt, user_urls) and an optional id. Blank lines and # comments are skipped.
+    Raises ValueError if two jobs end up with the same id (e.g. two identical lines), since
+    they would share one status file and checkpoint.
+    """
+    jobs = []
+    seen = {}
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            entry = json.loads(line)
+            if "id" not in entry:
+                # Stable across runs, so a re-run of the same manifest resumes the same jobs
+                repo = re.sub(r"[^A-Za-z0-9]+", "-", entry.get("repo_url", "").split("github.com/")[-1]).strip("-")
+                entry["id"] = f"{repo}-{hashlib.sha1(line.encode()).hexdigest()[:8]}"
+            if entry["id"] in seen:
+                raise ValueError(f"{manifest_path}:{line_number}: duplicate job id {entry['id']!r} "
+                                 f"(first used on line {seen[entry['id']]}); give the jobs distinct ids")
+            seen[entry["id"]] = line_number
+            jobs.append(entry)
+    return jobs
+
+def job_shared(entry, preferences):
+    """Initial shared store for a job, filled with the same defaults the interactive flow offers."""
+    user_urls = entry.get("user_urls", [])
+    if isinstance(user_urls, str):
+        user_urls = [u.strip() for u in user_urls.split(",") if u.strip()]
+    return {
+        "repo_url": entry["repo_url"],
+        "notes": entry.get("notes", ""),
+        "extra": entry.get("extra", ""),
+        "series": entry.get("series", preferences.get("default_series", "")),
+        "is_new_series": entry.get("is_new_series", preferences.get("default_is_new_series", "no")),
+        "emotions": entry.get("emotions", preferences.get("default_mood", "")),
+        "takeaway": entry.get("takeaway", preferences.get("default_takeaway", "")),
+        "anecdotes": entry.get("anecdotes", preferences.get("default_anecdotes", "")),
+        "opening_line": entry.get("opening_line", preferences.get("default_opening_line", "")),
+        "system_prompt": entry.get("system_prompt", preferences.get("default_system_prompt", "")),
+        "user_urls": user_urls
+    }
+
+class JobStatus:
+    """Per-job status file (<status_dir>/<job id>.json), rewritten atomically on every update."""
+    def __init__(self, status_dir, job_id):
+        self.path = os.path.join(status_dir, f"{job_id}.json")
+        self.data = self.load() or {"id": job_id, "status": "pending", "stages": []}
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def update(self, **fields):
+        self.data.update(fields)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
+
+def run_job(entry, preferences, blog_context, status):
+    nodes = [RepoAnalyzerNode(), WebContextNode(), BlogDraftGeneratorNode()]
+    stage_names = {node: type(node).__name__ for node in nodes}
+    # Quiet, collision-free draft output when many jobs stream at once
+    nodes[-1].set_params({"live_output": False, "draft_name": f"blog_{entry['id']}.md"})
+    shared = job_shared(entry, preferences)
+    shared.update(blog_context)
+    shared["run_id"] = f"batch-{entry['id']}"
+    status.update(status="running", started_at=_now(), stages=[], error=None, traceback=None)
+    def on_finish(node):
+        status.update(stages=status.data["stages"] + [stage_names[node]])
+    # Checkpoints per job, so a re-run job picks up after its last successful stage
+    run_dag(nodes, shared, on_finish=on_finish, checkpoint=RunCheckpoint(f"batch-{entry['id']}"))
+    status.update(status="done", finished_at=_now(), blog_file_path=shared["blog_file_path"])
+    return shared
+
+def run_batch(manifest_path, workers=4, status_dir=None, on_update=None):
+    """
+    Generate drafts for every job in the manifest on a pool of worker threads.
+    The blog corpus/style context is computed once and shared by all jobs; GitHub and LLM
+    calls are capped process-wide (GITHUB_MAX_CONCURRENCY, LLM_MAX_CONCURRENCY) and share
+    the same caches. Jobs already marked done in status_dir are skipped, so an interrupted
+    batch resumes where it stopped. on_update(job_id, status) is called after each job.
+    Returns {job id: final status}.
+    """
+    preferences = load_preferences()
+    jobs = load_manifest(manifest_path)
+    status_dir = status_dir or os.path.join(BATCH_STATUS_DIR, os.path.splitext(os.path.basename(manifest_path))[0])
+    os.makedirs(status_dir, exist_ok=True)
+    statuses = {job["id"]: JobStatus(status_dir, job["id"]) for job in jobs}
+    pending = [job for job in jobs if statuses[job["id"]].data.get("status") != "done"]
+    results = {job["id"]: statuses[job["id"]].data["status"] for job in jobs}
+    if not pending:
+        return results
+    lock = threading.Lock()
+    def finish(job_id, status):
+        with lock:
+            results[job_id] = status.data["status"]
+            if on_update:
+                on_update(job_id, status.data)
+    # Every job shares the same blog corpus and style, so compute it once
+    blog_shared = {}
+    try:
+        BlogContextNode().run(blog_shared)
+    except Exception as e:
+        # Without it no job can run: record why on each of them, so a re-run retries them all
+        for entry in pending:
+            status = statuses[entry["id"]]
+            status.update(status="failed", finished_at=_now(), error=f"BlogContextNode: {type(e).__name__}: {e}",
+                          traceback=traceback.format_exc())
+            finish(entry["id"], status)
+        return results
+    def run_one(entry):
+        status = statuses[entry["id"]]
+        try:
+            run_job(entry, preferences, blog_shared, status)
+        except Exception as e:
+            status.update(status="failed", finished_at=_now(), error=f"{type(e).__name__}: {e}",
+                          traceback=traceback.format_exc())
+        finish(entry["id"], status)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        list(pool.map(run_one, pending))
+    return results
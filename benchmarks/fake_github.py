@@ -0,0 +1,427 @@
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs, unquote
+import base64
+import datetime
+import hashlib
+import json
+import re
+import threading
+import time
+
+EXTENSIONS = [".py", ".py", ".js", ".go", ".md", ".json", ".yaml", ".txt"]
+EPOCH = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+
+def git_sha(content):
+    """SHA-1 of a git blob object, like GitHub reports it."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+def _iso(days):
+    return (EPOCH + datetime.timedelta(days=days)).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _lines(seed, count):
+    return "".join(f"line {i} of {seed}: value_{(i * 7919 + len(seed)) % 1000} = compute({i})\n" for i in range(count))
+
+class FakeRepo:
+    """
+    A synthetic repository: `files` files spread over directories `depth` levels deep,
+    each about `file_size` bytes, plus a README, a few manifests and `commits` commits.
+    File contents are regenerated from their path on demand, so large repos stay cheap.
+    """
+    def __init__(self, full_name, files=200, depth=3, file_size=2000, commits=60):
+        self.full_name = full_name
+        self.commits = commits
+        self.files = {}
+        self.by_sha = {}
+        for path in ["README.md", "main.py", "setup.py", "requirements.txt"]:
+            self._add(path, max(file_size // 4, 200))
+        for i in range(files):
+            dirs = [f"pkg{(i >> (2 * level)) % 4}" for level in range(depth)]
+            ext = EXTENSIONS[i % len(EXTENSIONS)]
+            # Spread sizes over 0.25x-2x so "largest files" has something to rank
+            self._add("/".join(["src"] + dirs + [f"module_{i}{ext}"]), file_size * (1 + i % 8) // 4)
+        # Git Data API state: branch heads, commits created through the API, opened PRs
+        self.refs = {"main": self.commit(commits - 1)["sha"] if commits else "0" * 40}
+        self.git_commits = {}
+        self.pulls = []
+        # Blob SHA of each file written through the contents API, keyed by (branch, path)
+        self.written = {}
+
+    def _add(self, path, size):
+        content = self.content(path, size)
+        self.files[path] = {"size": len(content), "sha": git_sha(content), "target": size}
+        self.by_sha[self.files[path]["sha"]] = path
+
+    @staticmethod
+    def content(path, size):
+        text = f"# {path}\n" + _lines(path, max(size // 50, 1))
+        return text.encode()[:max(size, 1)]
+
+    def blob(self, sha):
+        path = self.by_sha.get(sha)
+        return self.content(path, self.files[path]["target"]) if path else None
+
+    def file(self, path):
+        meta = self.files.get(path)
+        return self.content(path, meta["target"]) if meta else None
+
+    def commit(self, index):
+        sha = hashlib.sha1(f"{self.full_name}:{index}".encode()).hexdigest()
+        touched = sorted(self.files)[index % len(self.files)::max(len(self.files) // 3, 1)][:3]
+        return {
+            "sha": sha,
+            "date": _iso(index),
+            "message": f"Commit {index}: update {', '.join(touched)}",
+            "files": [{"filename": path, "status": "modified", "additions": 3 + index % 5,
+                       "deletions": index % 3, "changes": 3 + index % 5 + index % 3} for path in touched]
+        }
+
+class FakeBlog(FakeRepo):
+    """A synthetic blog repo: `posts` markdown posts of about `words` words under content/posts."""
+    def __init__(self, full_name, posts=30, words=800, posts_dir="content/posts"):
+        self.posts_dir = posts_dir
+        super().__init__(full_name, files=0, depth=0, commits=posts)
+        for i in range(posts):
+            self._add(f"{posts_dir}/post-{i:03d}.md", words * 6)
+
+    @staticmethod
+    def content(path, size):
+        if not path.endswith(".md") or "/" not in path:
+            return FakeRepo.content(path, size)
+        words = ["system", "terminal", "network", "tool", "build", "learned", "debug", "fast", "simple", "story"]
+        body = []
+        for i in range(size // 6):
+            body.append(words[(i * 31 + len(path)) % len(words)])
+            if i % 12 == 11:
+                body.append(".\n" if i % 60 == 59 else ".")
+        return (f"---\ntitle: {path.rsplit('/', 1)[-1]}\n---\n\n# {path}\n\n" + " ".join(body)).encode()
+
+    def post_date(self, path):
+        return _iso(sorted(p for p in self.files if p.startswith(self.posts_dir)).index(path))
+
+class FakeGitHub:
+    """
+    Local stand-in for the GitHub REST API (and the GraphQL history lookups load_blog_corpus makes),
+    serving FakeRepos over plain HTTP. It honours If-None-Match with 304s, enforces a quota of
+    rate_limit requests per rate_limit_window seconds (403 once exhausted), can answer every
+    throttle_every-th request with a secondary-limit 403 + Retry-After, can add per-request
+    latency, and counts every request by endpoint.
+    GET /_bench/stats returns the counters without counting itself.
+    """
+    def __init__(self, repos, latency=0.0, rate_limit=5000, rate_limit_window=3600, throttle_every=0):
+        self.repos = {repo.full_name: repo for repo in repos}
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.throttle_every = throttle_every
+        self.remaining = rate_limit
+        self.reset_at = time.time() + rate_limit_window
+        self.seen = 0
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        with self._lock:
+            return {"total": sum(v for k, v in self.counts.items() if k != "304"), **self.counts}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                server._dispatch(self, "GET")
+
+            def do_POST(self):
+                server._dispatch(self, "POST")
+
+            def do_PATCH(self):
+                server._dispatch(self, "PATCH")
+
+            def do_PUT(self):
+                server._dispatch(self, "PUT")
+
+        return Handler
+
+    def _send(self, handler, status, body, headers=None):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        etag = f'"{hashlib.sha1(data).hexdigest()}"'
+        if status == 200 and handler.command == "GET" and handler.headers.get("If-None-Match") == etag:
+            status, data = 304, b""
+        handler.send_response(status)
+        handler.send_header("Content-Type", "text/html" if isinstance(body, bytes) else "application/json")
+        handler.send_header("Content-Length", str(len(data)))
+        handler.send_header("ETag", etag)
+        handler.send_header("X-RateLimit-Limit", str(self.rate_limit))
+        handler.send_header("X-RateLimit-Remaining", str(self.remaining))
+        handler.send_header("X-RateLimit-Reset", str(int(self.reset_at)))
+        for key, value in (headers or {}).items():
+            handler.send_header(key, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+        return status
+
+    def _dispatch(self, handler, method):
+        url = urlparse(handler.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        body = None
+        if method in ("POST", "PATCH", "PUT"):
+            length = int(handler.headers.get("Content-Length") or 0)
+            body = json.loads(handler.rfile.read(length) or b"{}")
+        if url.path == "/_bench/stats":
+            return self._send(handler, 200, self.stats())
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            if time.time() >= self.reset_at:
+                self.remaining = self.rate_limit
+                self.reset_at = time.time() + self.rate_limit_window
+            self.seen += 1
+            exhausted = self.remaining <= 0
+            throttled = self.throttle_every and self.seen % self.throttle_every == 0
+        if exhausted:
+            route, status, payload, headers = "rate_limited", 403, {"message": "API rate limit exceeded"}, None
+        elif throttled:
+            route, status, payload, headers = ("throttled", 403, {"message": "You have exceeded a secondary rate limit"},
+                                               {"Retry-After": "1"})
+        else:
+            try:
+                route, status, payload, headers = self._route(method, unquote(url.path), query, body, handler.headers)
+            except KeyError:
+                route, status, payload, headers = "not_found", 404, {"message": "Not Found"}, None
+        sent = self._send(handler, status, payload, headers)
+        with self._lock:
+            self.counts[f"{method} {route}"] += 1
+            # Like GitHub, conditional requests answered with 304 don't use up the quota
+            if sent == 304:
+                self.counts["304"] += 1
+            elif route not in ("rate_limited", "throttled"):
+                self.remaining = max(self.remaining - 1, 0)
+
+    def _route(self, method, path, query, body, request_headers):
+        if method == "POST" and path == "/graphql":
+            return "graphql", 200, self._graphql(body), None
+        m = re.match(r"^/pages/(\d+)$", path)
+        if m:
+            words = " ".join(f"word{i}" for i in range(400))
+            return "page", 200, f"<html><body><h1>Page {m.group(1)}</h1><p>{words}</p></body></html>".encode(), None
+        m = re.match(r"^/repos/([^/]+/[^/]+)(/.*)?$", path)
+        repo = self.repos[m.group(1)]
+        rest = m.group(2) or ""
+        base = f"{self.url}/repos/{repo.full_name}"
+        if rest == "":
+            return "repo", 200, self._repo_json(repo), None
+        m = re.match(r"^/git/trees/([^/]+)$", rest)
+        if m:
+            tree = [{"path": p, "mode": "100644", "type": "blob", "sha": meta["sha"], "size": meta["size"],
+                     "url": f"{base}/git/blobs/{meta['sha']}"} for p, meta in sorted(repo.files.items())]
+            sha = hashlib.sha1(json.dumps(tree).encode()).hexdigest()
+            return "tree", 200, {"sha": sha, "url": f"{base}/git/trees/{sha}", "tree": tree, "truncated": False}, None
+        m = re.match(r"^/git/blobs/([0-9a-f]+)$", rest)
+        if m:
+            content = repo.blob(m.group(1))
+            if content is None:
+                raise KeyError(m.group(1))
+            if request_headers.get("Accept") == "application/vnd.github.raw":
+                r = re.match(r"^bytes=(\d+)-(\d+)$", request_headers.get("Range", ""))
+                if r:
+                    return "blob_range", 206, content[int(r.group(1)):int(r.group(2)) + 1], None
+                return "blob_raw", 200, content, None
+            return "blob", 200, {"sha": m.group(1), "size": len(content), "encoding": "base64",
+                                 "content": base64.b64encode(content).decode(),
+                                 "url": f"{base}/git/blobs/{m.group(1)}"}, None
+        if rest == "/commits":
+            return ("commits",) + self._commits(repo, base, query)
+        m = re.match(r"^/commits/([0-9a-f]+)$", rest)
+        if m:
+            for i in range(repo.commits):
+                commit = repo.commit(i)
+                if commit["sha"] == m.group(1):
+                    return "commit", 200, self._commit_json(base, commit, with_files=True), None
+            raise KeyError(m.group(1))
+        if method == "GET" and rest == "/pulls":
+            # Open PRs, optionally filtered by head ("owner:branch")
+            owner = repo.full_name.split("/")[0]
+            pulls = [self._pull_json(repo, base, number) for number, pull in enumerate(repo.pulls, 1)
+                     if query.get("head") in (None, f"{owner}:{pull['head']}")]
+            return "pulls", 200, pulls, None
+        if method != "GET" or rest.startswith(("/branches/", "/git/ref/", "/git/commits/")):
+            return self._git_data(repo, base, method, rest, body)
+        if rest == "/readme":
+            return "readme", 200, self._content_json(repo, base, "README.md", with_content=True), None
+        m = re.match(r"^/contents/?(.*)$", rest)
+        if m:
+            path = m.group(1).strip("/")
+            if path in repo.files:
+                return "contents", 200, self._content_json(repo, base, path, with_content=True), None
+            entries = self._listing(repo, base, path)
+            if not entries:
+                raise KeyError(path)
+            return "contents", 200, entries, None
+        raise KeyError(path)
+
+    def _git_data(self, repo, base, method, rest, body):
+        # Just enough of the Git Data API for the single-commit publisher; trees are not applied to files
+        m = re.match(r"^/branches/(.+)$", rest)
+        if method == "GET" and m:
+            sha = repo.refs[m.group(1)]
+            commit = {"sha": sha, "url": f"{base}/commits/{sha}", "commit": self._git_commit_json(repo, base, sha)}
+            return "branch", 200, {"name": m.group(1), "commit": commit}, None
+        m = re.match(r"^/git/ref/heads/(.+)$", rest)
+        if method == "GET" and m:
+            return "ref", 200, self._ref_json(base, m.group(1), repo.refs[m.group(1)]), None
+        m = re.match(r"^/git/commits/([0-9a-f]+)$", rest)
+        if method == "GET" and m:
+            return "git_commit", 200, self._git_commit_json(repo, base, m.group(1)), None
+        if method == "POST" and rest == "/git/blobs":
+            content = body["content"]
+            data = base64.b64decode(content) if body.get("encoding") == "base64" else content.encode()
+            sha = git_sha(data)
+            return "create_blob", 201, {"sha": sha, "url": f"{base}/git/blobs/{sha}"}, None
+        if method == "POST" and rest == "/git/trees":
+            sha = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+            return "create_tree", 201, {"sha": sha, "url": f"{base}/git/trees/{sha}", "tree": [], "truncated": False}, None
+        if method == "POST" and rest == "/git/commits":
+            sha = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+            repo.git_commits[sha] = {"tree": body["tree"], "parents": body["parents"], "message": body["message"]}
+            return "create_commit", 201, self._git_commit_json(repo, base, sha), None
+        if method == "POST" and rest == "/git/refs":
+            name = body["ref"].removeprefix("refs/heads/")
+            if name in repo.refs:
+                return "create_ref", 422, {"message": "Reference already exists"}, None
+            repo.refs[name] = body["sha"]
+            return "create_ref", 201, self._ref_json(base, name, body["sha"]), None
+        m = re.match(r"^/git/refs/heads/(.+)$", rest)
+        if method == "PATCH" and m:
+            repo.refs[m.group(1)] = body["sha"]
+            return "update_ref", 200, self._ref_json(base, m.group(1), body["sha"]), None
+        m = re.match(r"^/contents/(.+)$", rest)
+        if method == "PUT" and m:
+            path, branch = m.group(1), body.get("branch", "main")
+            # Files that arrived through git trees aren't tracked, so any sha is accepted for those
+            current = repo.written.get((branch, path))
+            if current is not None and body.get("sha") != current:
+                return "put_contents", 409, {"message": f"{path} does not match {body.get('sha')}"}, None
+            sha = git_sha(base64.b64decode(body["content"]))
+            repo.written[(branch, path)] = sha
+            commit_sha = hashlib.sha1(json.dumps(body, sort_keys=True).encode()).hexdigest()
+            content = {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path, "sha": sha,
+                       "url": f"{base}/contents/{path}"}
+            return "put_contents", 200, {"content": content,
+                                         "commit": {"sha": commit_sha, "url": f"{base}/git/commits/{commit_sha}"}}, None
+        if method == "POST" and rest == "/pulls":
+            if any(pull["head"] == body["head"] for pull in repo.pulls):
+                return "create_pull", 422, {"message": f"A pull request already exists for {body['head']}."}, None
+            repo.pulls.append(body)
+            return "create_pull", 201, self._pull_json(repo, base, len(repo.pulls)), None
+        raise KeyError(rest)
+
+    def _pull_json(self, repo, base, number):
+        pull = repo.pulls[number - 1]
+        return {"number": number, "title": pull["title"], "state": "open", "url": f"{base}/pulls/{number}",
+                "html_url": f"https://github.com/{repo.full_name}/pull/{number}"}
+
+    def _git_commit_json(self, repo, base, sha):
+        info = repo.git_commits.get(sha, {"tree": "0" * 40, "parents": [], "message": "Synthetic head"})
+        author = {"name": "Bench Author", "email": "bench@example.com", "date": _iso(0)}
+        return {"sha": sha, "url": f"{base}/git/commits/{sha}", "message": info["message"],
+                "tree": {"sha": info["tree"], "url": f"{base}/git/trees/{info['tree']}"},
+                "parents": [{"sha": p, "url": f"{base}/git/commits/{p}"} for p in info["parents"]],
+                "author": author, "committer": author}
+
+    def _ref_json(self, base, name, sha):
+        return {"ref": f"refs/heads/{name}", "url": f"{base}/git/refs/heads/{name}",
+                "object": {"sha": sha, "type": "commit", "url": f"{base}/git/commits/{sha}"}}
+
+    def _repo_json(self, repo):
+        owner, name = repo.full_name.split("/")
+        return {"id": abs(hash(repo.full_name)) % 10 ** 8, "name": name, "full_name": repo.full_name,
+                "owner": {"login": owner, "type": "User"}, "private": False, "default_branch": "main",
+                "url": f"{self.url}/repos/{repo.full_name}",
+                "html_url": f"https://github.com/{repo.full_name}"}
+
+    def _content_json(self, repo, base, path, with_content=False):
+        meta = repo.files[path]
+        data = {"type": "file", "name": path.rsplit("/", 1)[-1], "path": path, "sha": meta["sha"],
+                "size": meta["size"], "url": f"{base}/contents/{path}"}
+        if with_content:
+            data.update(encoding="base64", content=base64.b64encode(repo.file(path)).decode())
+        return data
+
+    def _listing(self, repo, base, path):
+        prefix = f"{path}/" if path else ""
+        entries, dirs = [], set()
+        for file_path in sorted(repo.files):
+            if not file_path.startswith(prefix):
+                continue
+            head, _, tail = file_path[len(prefix):].partition("/")
+            if tail:
+                if head not in dirs:
+                    dirs.add(head)
+                    entries.append({"type": "dir", "name": head, "path": prefix + head, "sha": "0" * 40,
+                                    "size": 0, "url": f"{base}/contents/{prefix + head}"})
+            else:
+                entries.append(self._content_json(repo, base, file_path))
+        return entries
+
+    def _commit_json(self, base, commit, with_files=False):
+        author = {"name": "Bench Author", "email": "bench@example.com", "date": commit["date"]}
+        data = {"sha": commit["sha"], "url": f"{base}/commits/{commit['sha']}",
+                "commit": {"author": author, "committer": author, "message": commit["message"]},
+                "author": None, "committer": None, "parents": []}
+        if with_files:
+            additions = sum(f["additions"] for f in commit["files"])
+            deletions = sum(f["deletions"] for f in commit["files"])
+            data.update(files=commit["files"],
+                        stats={"additions": additions, "deletions": deletions, "total": additions + deletions})
+        return data
+
+    def _commits(self, repo, base, query):
+        # Newest first, like GitHub; supports since= and page/per_page with a Link header
+        commits = [repo.commit(i) for i in reversed(range(repo.commits))]
+        if "since" in query:
+            commits = [c for c in commits if c["date"] >= query["since"].replace("+00:00", "Z")]
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        chunk = commits[(page - 1) * per_page:page * per_page]
+        headers = {}
+        if page * per_page < len(commits):
+            params = "&".join(f"{k}={v}" for k, v in {**query, "page": page + 1}.items())
+            headers["Link"] = f'<{base}/commits?{params}>; rel="next"'
+        return 200, [self._commit_json(base, c) for c in chunk], headers
+
+    def _graphql(self, body):
+        owner, name = body["variables"]["owner"], body["variables"]["name"]
+        repo = self.repos[f"{owner}/{name}"]
+        target = {}
+        for alias, path in re.findall(r'(\w+): history\(first: 1, path: ("(?:[^"\\]|\\.)*")\)', body["query"]):
+            path = json.loads(path)
+            date = repo.post_date(path) if isinstance(repo, FakeBlog) and path in repo.files else None
+            target[alias] = {"nodes": [{"committedDate": date}] if date else []}
+        if "defaultBranchRef" in body["query"]:
+            return {"data": {"repository": {"defaultBranchRef": {"target": target}}}}
+        # Batched commit stats lookups
+        commits = {c["sha"]: c for c in map(repo.commit, range(repo.commits))}
+        found = {}
+        for alias, sha in re.findall(r'(\w+): object\(oid: "([0-9a-f]+)"\)', body["query"]):
+            commit = commits.get(sha)
+            found[alias] = commit and {"additions": sum(f["additions"] for f in commit["files"]),
+                                       "deletions": sum(f["deletions"] for f in commit["files"]),
+                                       "changedFilesIfAvailable": len(commit["files"])}
+        return {"data": {"repository": found}}
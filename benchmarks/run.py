@@ -0,0 +1,275 @@
+"""
+Offline benchmarks for the blog pipeline.
+
+Starts a local stand-in GitHub server (benchmarks/fake_github.py) with synthetic repos and a
+synthetic blog, then runs each scenario in a fresh subprocess against it with the fake LLM and
+fake web search, so nothing touches the network and every scenario starts with cold caches.
+Each scenario runs twice (cold, then warm caches) and reports wall time, GitHub requests and peak
+memory growth. Request counts are compared with benchmarks/baseline.json; any increase fails the run.
+
+    python -m benchmarks.run                      # all scenarios
+    python -m benchmarks.run analyze_codebase --large-files 20000
+    python -m benchmarks.run --update-baseline    # accept the current request counts
+"""
+from benchmarks.fake_github import FakeGitHub, FakeRepo, FakeBlog
+from rich.console import Console
+from rich.table import Table
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+SMALL_REPO = "bench/small"
+LARGE_REPO = "bench/large"
+BLOG_REPO = "harish876/harish876.github.io"
+
+console = Console()
+
+# Each scenario does its setup (imports, fetching inputs) and returns the callable to measure.
+def bench_analyze_codebase(server_url):
+    from utils.github_utils import analyze_codebase
+    return lambda: analyze_codebase(LARGE_REPO)
+
+def bench_blog_corpus(server_url):
+    from utils.blog_scraper import fetch_all_blogs, fetch_latest_blog
+    # Both wrappers share one snapshot, so each pass downloads the posts once
+    return lambda: (fetch_all_blogs(), fetch_latest_blog())
+
+def bench_analyze_style(server_url):
+    from utils.blog_scraper import load_blog_corpus
+    from utils.style_analyzer import analyze_style
+    blogs = load_blog_corpus()["blogs"]
+    return lambda: analyze_style(blogs)
+
+def bench_web_context(server_url):
+    from nodes import WebContextNode
+    def run():
+        shared = {
+            "readme": "# Bench\nA synthetic project using sqlite, asyncio and numpy.",
+            "commits": [{"message": f"Commit {i}: tune the cache"} for i in range(20)],
+            "notes": "Benchmark notes.",
+            "user_urls": [f"{server_url}/pages/{i}" for i in range(3)]
+        }
+        WebContextNode().run(shared)
+    return run
+
+def bench_blog_flow(server_url):
+    from batch import job_shared
+    from flow import run_dag
+    from nodes import RepoAnalyzerNode, WebContextNode, BlogContextNode, BlogDraftGeneratorNode
+    from utils.pr_creator import load_preferences
+    def run():
+        shared = job_shared({"repo_url": f"https://github.com/{SMALL_REPO}", "notes": "Benchmark run."}, load_preferences())
+        nodes = [RepoAnalyzerNode(), WebContextNode(), BlogContextNode(), BlogDraftGeneratorNode()]
+        nodes[-1].set_params({"live_output": False, "draft_name": "bench.md"})
+        run_dag(nodes, shared)
+    return run
+
+def bench_publish(server_url):
+    from utils.pr_creator import create_posts_pr
+    posts = {f"bench-post-{i}.md": f"# Post {i}\n\nSynthetic body {i}." for i in range(5)}
+    assets = {"diagram.png": bytes(range(256)) * 8, "photo.jpg": b"\xff\xd8" + bytes(1000)}
+    # The warm pass publishes to the now-existing branch
+    return lambda: create_posts_pr(posts, "bench-publish", "Add 5 posts", "Benchmark run.", assets)
+
+def bench_publish_assets(server_url):
+    from utils.pr_creator import create_posts_pr
+    # Binary files can't go inline in the tree request: each asset adds one blob request
+    posts = {"bench-gallery.md": "# Gallery\n\nTen images."}
+    assets = {f"image-{i}.png": b"\x89PNG" + bytes([i]) * 512 for i in range(10)}
+    return lambda: create_posts_pr(posts, "bench-gallery", "Add gallery", "Benchmark run.", assets)
+
+def bench_edit_commit(server_url):
+    from utils.edit_and_commit import commit_file
+    from utils.github_client import get_repo
+    from utils.pr_creator import create_posts_pr, load_preferences
+    os.makedirs("contents", exist_ok=True)
+    create_posts_pr({"bench-edit.md": "# Draft\n"}, "bench-edit", "Add draft", "Benchmark run.")
+    repo = get_repo(load_preferences()["repo"])
+    saves = iter(range(1000))
+    def run():
+        # One real edit, then a save with no changes: only the first should reach GitHub
+        with open("contents/bench-edit.md", "w") as f:
+            f.write(f"# Draft\n\nRevision {next(saves)}.\n")
+        for _ in range(2):
+            commit_file(repo, "contents/bench-edit.md", "content/posts/bench-edit.md", "bench-edit", "Update draft")
+    return run
+
+def bench_analyze_mirror(server_url):
+    # The large repo as a local git repo, analyzed through a mirror of it instead of the API
+    config = json.loads(os.environ["BENCH_CONFIG"])
+    repo = FakeRepo(LARGE_REPO, files=config["large_files"], depth=config["depth"], file_size=config["file_size"])
+    source = os.path.abspath(os.path.join("source", LARGE_REPO))
+    for path in repo.files:
+        os.makedirs(os.path.join(source, os.path.dirname(path)), exist_ok=True)
+        with open(os.path.join(source, path), "wb") as f:
+            f.write(repo.file(path))
+    git = ["git", "-c", "user.name=Bench", "-c", "user.email=bench@example.com"]
+    for args in (["init", "-q", "-b", "main"], ["add", "-A"], ["commit", "-q", "-m", "Synthetic repo"]):
+        subprocess.run(git + args, cwd=source, check=True)
+    os.environ.update(REPO_SOURCE="mirror", REPO_MIRROR_URL=os.path.abspath("source") + "/{repo}")
+    from utils.github_utils import analyze_codebase
+    return lambda: analyze_codebase(LARGE_REPO)
+
+SCENARIOS = {
+    "analyze_codebase": bench_analyze_codebase,
+    "analyze_mirror": bench_analyze_mirror,
+    "blog_corpus": bench_blog_corpus,
+    "analyze_style": bench_analyze_style,
+    "web_context": bench_web_context,
+    "blog_flow": bench_blog_flow,
+    "publish": bench_publish,
+    "publish_assets": bench_publish_assets,
+    "edit_commit": bench_edit_commit,
+}
+
+# Scenarios whose warm pass runs in a new process, so a process-wide memo can't stand in for the disk caches
+FRESH_PROCESS_SCENARIOS = {"blog_corpus"}
+
+def _max_rss_mb():
+    # ru_maxrss is in KiB on Linux and bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def _server_stats(server_url):
+    return requests.get(f"{server_url}/_bench/stats", timeout=10).json()
+
+def run_child(name, server_url, labels=("cold", "warm")):
+    """Run passes (cold, warm) of one scenario in this (fresh) process and print the measurements as JSON."""
+    measure = SCENARIOS[name](server_url)
+    rss_before = _max_rss_mb()
+    result = {"scenario": name}
+    for label in labels:
+        before = _server_stats(server_url)
+        start = time.perf_counter()
+        measure()
+        wall = time.perf_counter() - start
+        after = _server_stats(server_url)
+        result[label] = {
+            "wall": wall,
+            "requests": after["total"] - before["total"],
+            "routes": {k: after[k] - before.get(k, 0) for k in after if k != "total" and after[k] != before.get(k, 0)}
+        }
+        if label == "cold":
+            result["peak_mb"] = _max_rss_mb() - rss_before
+    print(json.dumps(result))
+
+def run_scenario(name, server, llm_latency, config):
+    with tempfile.TemporaryDirectory(prefix=f"bench-{name}-") as workdir:
+        env = dict(os.environ,
+                   PYTHONPATH=ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+                   GITHUB_API_URL=server.url,
+                   GITHUB_TOKEN="bench",
+                   LLM_BACKEND="fake",
+                   FAKE_LLM_LATENCY=str(llm_latency),
+                   WEB_SEARCH_BACKEND="fake",
+                   GITHUB_WRITE_INTERVAL="0",
+                   BENCH_CONFIG=json.dumps(config),
+                   BLOG_SETTINGS_FILE=os.path.join(workdir, "preferences.yaml"))
+        passes = [["cold"], ["warm"]] if name in FRESH_PROCESS_SCENARIOS else [["cold", "warm"]]
+        result = {}
+        for labels in passes:
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.run", "--child", name, "--server", server.url,
+                 "--passes", ",".join(labels)],
+                cwd=workdir, env=env, capture_output=True, text=True
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(f"scenario {name} failed:\n{proc.stderr[-4000:]}")
+            result.update(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return result
+
+def load_baseline():
+    try:
+        with open(BASELINE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a fake GitHub server and fake LLM")
+    parser.add_argument("scenarios", nargs="*", help=f"Scenarios to run (default: all of {', '.join(SCENARIOS)})")
+    parser.add_argument("--small-files", type=int, default=200, help="Files in the repo the blog flow analyzes")
+    parser.add_argument("--large-files", type=int, default=5000, help="Files in the repo analyze_codebase scans")
+    parser.add_argument("--depth", type=int, default=4, help="Directory depth of the synthetic repos")
+    parser.add_argument("--file-size", type=int, default=2000, help="Average file size in bytes")
+    parser.add_argument("--posts", type=int, default=30, help="Posts in the synthetic blog")
+    parser.add_argument("--post-words", type=int, default=800, help="Words per blog post")
+    parser.add_argument("--github-latency", type=float, default=0.0, help="Seconds added to every GitHub request")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds each fake LLM call takes")
+    parser.add_argument("--json", default=None, help="Also write the full results (incl. per-endpoint counts) here")
+    parser.add_argument("--update-baseline", action="store_true", help="Save the measured request counts as the new baseline")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--server", help=argparse.SUPPRESS)
+    parser.add_argument("--passes", default="cold,warm", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.server, args.passes.split(","))
+        return 0
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenario(s): {', '.join(unknown)}")
+
+    config = {"small_files": args.small_files, "large_files": args.large_files, "depth": args.depth,
+              "file_size": args.file_size, "posts": args.posts, "post_words": args.post_words}
+    server = FakeGitHub([
+        FakeRepo(SMALL_REPO, files=args.small_files, depth=args.depth, file_size=args.file_size),
+        FakeRepo(LARGE_REPO, files=args.large_files, depth=args.depth, file_size=args.file_size),
+        FakeBlog(BLOG_REPO, posts=args.posts, words=args.post_words)
+    ], latency=args.github_latency).start()
+    try:
+        results = [run_scenario(name, server, args.llm_latency, config) for name in args.scenarios or SCENARIOS]
+    finally:
+        server.stop()
+
+    baseline = load_baseline()
+    comparable = baseline.get("config") == config
+    if baseline and not comparable:
+        console.print("[yellow]Baseline was recorded with different sizes; request counts are not compared.[/yellow]")
+    table = Table(title="Offline benchmarks")
+    for column in ["Scenario", "Cold wall", "Warm wall", "Cold req", "Warm req", "Peak MB"]:
+        table.add_column(column, justify="left" if column == "Scenario" else "right")
+    regressions = []
+    for result in results:
+        expected = baseline.get("requests", {}).get(result["scenario"], {}) if comparable else {}
+        cells = []
+        for label in ("cold", "warm"):
+            measured = result[label]["requests"]
+            limit = expected.get(label)
+            if limit is not None and measured > limit:
+                regressions.append(f"{result['scenario']} ({label}): {measured} requests, baseline {limit}")
+                cells.append(f"[red]{measured} (>{limit})[/red]")
+            else:
+                cells.append(str(measured) if limit is None else f"{measured}/{limit}")
+        table.add_row(result["scenario"], f"{result['cold']['wall']:.2f}s", f"{result['warm']['wall']:.2f}s",
+                      *cells, f"{result['peak_mb']:.1f}")
+    console.print(table)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+    if args.update_baseline:
+        counts = baseline.get("requests", {}) if comparable else {}
+        counts.update({r["scenario"]: {"cold": r["cold"]["requests"], "warm": r["warm"]["requests"]} for r in results})
+        with open(BASELINE_PATH, "w", encoding="utf-8") as f:
+            json.dump({"config": config, "requests": counts}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        console.print(f"[green]Baseline updated: {BASELINE_PATH}[/green]")
+        return 0
+    if regressions:
+        console.print("[bold red]Request count regressions:[/bold red]")
+        for line in regressions:
+            console.print(f"  {line}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
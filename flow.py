@@ -1,8 +1,76 @@
-from pocketflow import Flow
+from pocketflow import Flow, BaseNode
 from nodes import (
     AnswerNode, GetQuestionNode, InputGatherNode, RepoAnalyzerNode, BlogContextNode, PersonalPromptNode,
     BlogDraftGeneratorNode, ReviewAndEditNode, PRCreatorNode
 )
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils.tracing import in_current_context
+
+def node_dependencies(nodes):
+    """
+    Map each node to the earlier nodes it must wait for: those writing a shared key it reads.
+    Nodes that don't declare reads/writes wait for (and block) every node listed before them.
+    """
+    deps = {}
+    for i, node in enumerate(nodes):
+        reads = getattr(node, "reads", None)
+        deps[node] = set()
+        for prev in nodes[:i]:
+            writes = getattr(prev, "writes", None)
+            if reads is None or writes is None or set(reads) & set(writes):
+                deps[node].add(prev)
+    return deps
+
+def _run_node(node, shared, checkpoint):
+    node.run(shared)
+    if checkpoint:
+        checkpoint.save(node, shared)
+
+def run_dag(nodes, shared, max_workers=None, on_start=None, on_finish=None, checkpoint=None):
+    """
+    Run nodes against shared, starting each one as soon as the nodes it depends on have finished,
+    so independent nodes overlap and total latency follows the critical path.
+    on_start/on_finish are called with each node (from the calling thread) for progress display.
+    With a checkpoint (utils.checkpoint.RunCheckpoint), nodes with a valid checkpoint are restored
+    instead of run, and every node that does run is checkpointed when it finishes.
+    """
+    deps = node_dependencies(nodes)
+    done = set()
+    running = {}
+    with ThreadPoolExecutor(max_workers=max_workers or len(nodes)) as pool:
+        while len(done) < len(nodes):
+            ready = [n for n in nodes if n not in done and n not in running.values() and deps[n] <= done]
+            while ready:
+                node = ready.pop(0)
+                if on_start:
+                    on_start(node)
+                if checkpoint and checkpoint.restore(node, shared):
+                    done.add(node)
+                    if on_finish:
+                        on_finish(node)
+                    # Restoring may have unblocked more nodes
+                    ready = [n for n in nodes if n not in done and n not in running.values() and deps[n] <= done]
+                    continue
+                running[pool.submit(in_current_context(_run_node), node, shared, checkpoint)] = node
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                node = running.pop(future)
+                future.result()
+                done.add(node)
+                if on_finish:
+                    on_finish(node)
+
+class ParallelStage(BaseNode):
+    """A flow step that runs a group of nodes with run_dag."""
+    def __init__(self, nodes, max_workers=None):
+        super().__init__()
+        self.nodes = nodes
+        self.max_workers = max_workers
+    def _run(self, shared):
+        run_dag(self.nodes, shared, self.max_workers)
+        return "default"
 
 def create_qa_flow():
     """Create and return a question-answering flow."""
@@ -25,7 +93,10 @@ def create_blog_flow():
     review_node = ReviewAndEditNode()
     pr_node = PRCreatorNode()
 
-    input_node >> repo_node >> blog_ctx_node >> personal_node >> draft_node >> review_node >> pr_node
+    # Blog context doesn't depend on the repo, so it runs alongside the repo analysis
+    context_stage = ParallelStage([repo_node, blog_ctx_node])
+
+    input_node >> context_stage >> personal_node >> draft_node >> review_node >> pr_node
     return Flow(start=input_node)
 
 qa_flow = create_qa_flow()
@@ -1,20 +1,34 @@
 import argparse
-from flow import create_qa_flow, create_blog_flow
+from flow import create_qa_flow, create_blog_flow, run_dag
 from dotenv import load_dotenv
 from rich.progress import Progress
-from rich.console import Console
+from rich import get_console
 from rich.prompt import Prompt, Confirm
-from github import Github
+from rich.table import Table
+from rich.markup import escape
+from github import GithubException
+import datetime
 import glob
 import os
+import time
 from nodes import (
     InputGatherNode, RepoAnalyzerNode, BlogContextNode, PersonalPromptNode,
     BlogDraftGeneratorNode, ReviewAndEditNode, PRCreatorNode, WebContextNode
 )
-from utils.pr_creator import load_preferences
+from batch import run_batch, job_shared
+from utils.pr_creator import load_preferences, create_posts_pr
+from utils.checkpoint import RunCheckpoint, new_run_id
+from utils.github_client import get_repo, get_connection_stats, get_cache_stats, get_rate_limit_stats
+from utils.edit_and_commit import commit_file
+from utils.file_watch import watch_changes
+from utils.draft_library import sync_library, search_drafts, record_draft
+from utils.call_llm import get_llm_cache_stats
+from utils.rate_limit import GitHubRateLimitError
+from utils.tracing import tracer
 
 load_dotenv()
-console = Console()
+# Shared with nodes.py, so node output lands above the progress bar
+console = get_console()
 
 def prompt_with_default(prompt, key, default, example=None):
     prompt_str = f"[bold cyan]{prompt}[/bold cyan]"
@@ -36,7 +50,8 @@ def run_qa_flow():
     print("Question:", shared["question"])
     print("Answer:", shared["answer"])
 
-def run_blog_flow():
+def gather_blog_inputs():
+    """Ask for the repo and personal context interactively; returns the initial shared store, or None if aborted."""
     preferences = load_preferences()
     console.rule("[bold green]PocketFlow Blog Generator[/bold green]")
     console.print("[bold yellow]Project Information[/bold yellow]")
@@ -71,9 +86,9 @@ def run_blog_flow():
     console.print(f"[bold]User URLs:[/bold] {user_urls}")
     if not Confirm.ask("Proceed with these settings?"):
         console.print("[red]Aborted.[/red]")
-        return
+        return None
 
-    shared = {
+    return {
         "repo_url": repo_url,
         "notes": notes,
         "extra": extra,
@@ -86,18 +101,47 @@ def run_blog_flow():
         "system_prompt": system_prompt,
         "user_urls": user_urls
     }
-    steps = [
-        ("Repo Analysis", RepoAnalyzerNode()),
-        ("Web Context", WebContextNode()),
-        ("Blog Context/Style", BlogContextNode()),
-        ("Draft Generation", BlogDraftGeneratorNode())
-    ]
-    with Progress() as progress:
+
+def run_blog_flow(resume=None):
+    if resume:
+        checkpoint = RunCheckpoint(resume)
+        shared = checkpoint.load_inputs()
+        if shared is None:
+            console.print(f"[red]No checkpoint found for run {resume}.[/red]")
+            return
+        console.rule(f"[bold green]Resuming run {resume}[/bold green]")
+    else:
+        shared = gather_blog_inputs()
+        if shared is None:
+            return
+        checkpoint = RunCheckpoint(new_run_id())
+        shared["run_id"] = checkpoint.run_id
+        checkpoint.save_inputs(shared)
+    console.print(f"[dim]Run ID: {checkpoint.run_id} (resume with: python main.py blog --resume {checkpoint.run_id})[/dim]")
+    steps = {
+        RepoAnalyzerNode(): "Repo Analysis",
+        WebContextNode(): "Web Context",
+        BlogContextNode(): "Blog Context/Style",
+        BlogDraftGeneratorNode(): "Draft Generation"
+    }
+    with Progress(console=console) as progress:
         task = progress.add_task("[cyan]Blog Generation Pipeline...", total=len(steps))
-        for step_name, node in steps:
-            progress.console.print(f"[bold yellow]Step: {step_name}[/bold yellow]")
-            node.run(shared)
+        def on_start(node):
+            progress.console.print(f"[bold yellow]Step: {steps[node]}[/bold yellow]")
+        def on_finish(node):
+            progress.console.print(f"[green]Done: {steps[node]}[/green]")
             progress.advance(task)
+        # Nodes run as soon as the shared keys they read are available (see flow.run_dag);
+        # checkpointed nodes whose inputs and code are unchanged are restored instead of re-run
+        run_dag(list(steps), shared, on_start=on_start, on_finish=on_finish, checkpoint=checkpoint)
+    conn_stats = get_connection_stats()
+    cache_stats = get_cache_stats()
+    console.print(f"[dim]GitHub: {conn_stats['requests']} requests, {conn_stats['opened']} connections opened, {conn_stats['reused']} reused; cache {cache_stats['hits']} hits / {cache_stats['misses']} misses[/dim]")
+    rate_stats = get_rate_limit_stats()
+    core = rate_stats["quotas"].get("core", {})
+    console.print(f"[dim]GitHub quota: {core.get('remaining', '?')}/{core.get('limit', '?')} left; {rate_stats['retries']} retries, {rate_stats['waited']:.1f}s waited on rate limits across threads[/dim]")
+    llm_stats = get_llm_cache_stats()
+    console.print(f"[dim]LLM cache: {llm_stats['memory_hits'] + llm_stats['disk_hits']} hits / {llm_stats['misses']} misses, ~{llm_stats['tokens_saved']} tokens and {llm_stats['latency_saved']:.1f}s saved[/dim]")
     # Interactive review/edit after progress bar
     console.rule("[bold green]Review/Edit[/bold green]")
     console.print("--- Blog Draft ---")
@@ -110,52 +154,156 @@ def run_blog_flow():
     blog_title = Prompt.ask("Enter a title for the blog post", default="")
     pr_node = PRCreatorNode()
     shared["blog_title"] = blog_title
-    pr_node.run(shared)
+    if checkpoint.run_node(pr_node, shared):
+        console.print(f"Pull Request already created: {shared['pr_url']}")
+
+def pick_draft(contents_dir, query=None):
+    """Search the draft library and let the user pick one; returns its library entry, or None if they enter q."""
+    sync_library(contents_dir)
+    while True:
+        if query is None:
+            query = Prompt.ask("Search drafts (blank for the most recent, q to cancel)", default="")
+        if query.strip().lower() == "q":
+            return None
+        start = time.perf_counter()
+        results = search_drafts(query)
+        elapsed = (time.perf_counter() - start) * 1000
+        if not results:
+            console.print(f"[red]No drafts match {query!r}.[/red]")
+            query = None
+            continue
+        table = Table(title=f"{len(results)} drafts ({elapsed:.1f} ms)")
+        for column in ["#", "Title", "Repo", "Branch", "Created", "File"]:
+            table.add_column(column)
+        for i, draft in enumerate(results):
+            table.add_row(str(i + 1), escape(draft["title"] or ""), draft["repo"] or "-", draft["branch"] or "-",
+                          (draft["created_at"] or "")[:16], draft["path"])
+            if draft["snippet"]:
+                table.add_row("", f"[dim]{escape(draft['snippet'])}[/dim]", "", "", "", "")
+        console.print(table)
+        choice = Prompt.ask("Select draft (number), a new search, or q to cancel", default="1")
+        if choice.isdigit() and 1 <= int(choice) <= len(results):
+            return results[int(choice) - 1]
+        query = choice
 
-def run_edit_commit():
+def run_edit_commit(query=None):
     preferences = load_preferences()
     contents_dir = preferences.get("default_local_contents_dir", "contents")
-    files = glob.glob(f"{contents_dir}/*.md")
-    if not files:
+    if not glob.glob(f"{contents_dir}/*.md"):
         console.print(f"[red]No markdown files found in {contents_dir}/.[/red]")
         return
-    console.print("[bold]Available markdown files:[/bold]")
-    for i, f in enumerate(files):
-        console.print(f"{i+1}. {f}")
-    idx = Prompt.ask("Select file to edit/commit (number)", default="1")
-    try:
-        idx = int(idx) - 1
-        file_path = files[idx]
-    except Exception:
-        console.print("[red]Invalid selection.[/red]")
+    draft = pick_draft(contents_dir, query)
+    if draft is None:
+        console.print("[yellow]Cancelled.[/yellow]")
         return
+    file_path = draft["path"]
     repo_name = Prompt.ask("GitHub repo name", default=preferences.get("repo", ""))
-    branch_name = Prompt.ask("PR branch name (e.g. blog-title-20240703-auto)")
+    branch_name = Prompt.ask("PR branch name (e.g. blog-title-20240703-auto)", default=draft["branch"])
     console.print(f"[green]Edit the file in your editor, then save and press Enter to continue...[/green]")
     input("Press Enter when done editing...")
     commit_msg = Prompt.ask("Commit message", default="Update blog post")
-    g = Github(os.environ.get("GITHUB_TOKEN"))
-    repo = g.get_repo(repo_name)
-    with open(file_path, "r") as f:
-        content = f.read()
+    repo = get_repo(repo_name)
     # Get the file path in the repo (strip local dir if needed)
     posts_dir = preferences.get("posts_dir", "content/posts")
-    rel_path = os.path.basename(file_path)
-    repo_path = f"{posts_dir}/{rel_path}"
-    # Get the file SHA if it exists in the branch
+    repo_path = f"{posts_dir}/{os.path.basename(file_path)}"
+    if commit_file(repo, file_path, repo_path, branch_name, commit_msg):
+        record_draft(file_path, branch=branch_name)
+        console.print(f"[bold green]Committed and pushed {file_path} to {repo_name}@{branch_name}![/bold green]")
+    else:
+        console.print(f"[yellow]{file_path} is unchanged on {repo_name}@{branch_name}; nothing to commit.[/yellow]")
+
+def run_edit_watch(repo_name=None, branch_name=None, commit_msg=None, debounce=None):
+    """Commit every markdown file in the contents dir each time it is saved, until Ctrl-C."""
+    preferences = load_preferences()
+    contents_dir = preferences.get("default_local_contents_dir", "contents")
+    posts_dir = preferences.get("posts_dir", "content/posts")
+    repo_name = repo_name or Prompt.ask("GitHub repo name", default=preferences.get("repo", ""))
+    branch_name = branch_name or Prompt.ask("PR branch name (e.g. blog-title-20240703-auto)")
+    commit_msg = commit_msg or "Update blog post"
+    repo = get_repo(repo_name)
+    console.print(f"[green]Watching {contents_dir}/*.md; saves are committed to {repo_name}@{branch_name}. Ctrl-C to stop.[/green]")
+    try:
+        for paths in watch_changes(contents_dir, "*.md", debounce):
+            for file_path in sorted(paths):
+                if not os.path.exists(file_path):
+                    continue
+                repo_path = f"{posts_dir}/{os.path.basename(file_path)}"
+                try:
+                    committed = commit_file(repo, file_path, repo_path, branch_name, f"{commit_msg}: {os.path.basename(file_path)}")
+                    if committed:
+                        record_draft(file_path, branch=branch_name)
+                except (GithubException, GitHubRateLimitError, OSError) as e:
+                    # One failed save (network blip, file gone mid-read, ...) shouldn't end the watch;
+                    # the next save of the file commits it again
+                    console.print(f"[red]Could not commit {file_path}: {escape(str(e))}[/red]")
+                    continue
+                if committed:
+                    console.print(f"[bold green]Committed {file_path}[/bold green]")
+                else:
+                    console.print(f"[dim]{file_path} unchanged, skipped[/dim]")
+    except KeyboardInterrupt:
+        console.print("[dim]Stopped watching.[/dim]")
+
+def run_publish(paths, asset_paths=(), branch_name=None, pr_title=None):
+    """Publish one or more local drafts (and their assets) as a single commit and PR."""
+    posts = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            posts[os.path.basename(path)] = f.read()
+    assets = {}
+    for path in asset_paths:
+        with open(path, "rb") as f:
+            assets[os.path.basename(path)] = f.read()
+    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    branch_name = branch_name or f"blog-posts-{timestamp}-auto"
+    if not pr_title:
+        pr_title = f"Add blog: {os.path.splitext(next(iter(posts)))[0]}" if len(posts) == 1 else f"Add {len(posts)} blog posts"
+    pr_url = create_posts_pr(posts, branch_name, pr_title, "Automated blog post PR. Please review.", assets)
+    for path in paths:
+        record_draft(path, branch=branch_name)
+    console.print(f"[bold green]Published {len(posts)} post(s) and {len(assets)} asset(s) in one commit: {pr_url}[/bold green]")
+
+def run_batch_flow(manifest, workers, status_dir=None):
+    console.rule("[bold green]PocketFlow Batch Blog Generator[/bold green]")
+    def on_update(job_id, status):
+        color = "green" if status["status"] == "done" else "red"
+        detail = status.get("blog_file_path") or status.get("error", "")
+        console.print(f"[{color}]{status['status']}[/{color}] {job_id} {detail}")
     try:
-        contents = repo.get_contents(repo_path, ref=branch_name)
-        sha = contents.sha
-    except Exception:
-        sha = None
-    repo.update_file(
-        repo_path,
-        commit_msg,
-        content,
-        sha,
-        branch=branch_name
-    )
-    console.print(f"[bold green]Committed and pushed {file_path} to {repo_name}@{branch_name}![/bold green]")
+        results = run_batch(manifest, workers=workers, status_dir=status_dir, on_update=on_update)
+    except ValueError as e:
+        console.print(f"[red]{escape(str(e))}[/red]")
+        return
+    done = sum(1 for s in results.values() if s == "done")
+    console.print(f"[bold]{done}/{len(results)} jobs done[/bold] (re-run the same command to resume failed or unfinished jobs)")
+
+def run_profile(repo_url, notes="", trace_file="trace.json"):
+    """Run the blog pipeline non-interactively with tracing on; print per-node stats and write a Chrome trace."""
+    shared = job_shared({"repo_url": repo_url, "notes": notes}, load_preferences())
+    nodes = [RepoAnalyzerNode(), WebContextNode(), BlogContextNode(), BlogDraftGeneratorNode()]
+    nodes[-1].set_params({"live_output": False})
+    tracer.enabled = True
+    tracer.reset()
+    with console.status("[cyan]Profiling blog pipeline..."):
+        run_dag(nodes, shared)
+    tracer.enabled = False
+    tracer.write_chrome_trace(trace_file)
+
+    table = Table(title="Per-node profile")
+    columns = {
+        "github_requests": "GH req", "github_cache_hits": "GH cached", "rate_limit_remaining": "RL left",
+        "llm_calls": "LLM calls", "llm_cache_hits": "LLM cached",
+        "llm_prompt_chars": "Prompt chars", "llm_response_chars": "Resp chars"
+    }
+    table.add_column("Node")
+    table.add_column("Wall", justify="right")
+    for label in columns.values():
+        table.add_column(label, justify="right")
+    for name, stats in tracer.node_stats.items():
+        row = [str(stats.get(key, "-")) for key in columns]
+        table.add_row(name.removesuffix("Node"), f"{stats['wall_time']:.2f}s", *row)
+    console.print(table)
+    console.print(f"[dim]Chrome trace written to {trace_file} (open in chrome://tracing or https://ui.perfetto.dev)[/dim]")
 
 def main():
     parser = argparse.ArgumentParser(description="PocketFlow Project CLI")
@@ -166,18 +314,53 @@ def main():
 
     # Blog Flow
     blog_parser = subparsers.add_parser("blog", help="Run the Project-to-Blog flow")
+    blog_parser.add_argument("--resume", metavar="RUN_ID", default=None, help="Resume a previous run from its checkpoints")
 
     # Edit and Commit Utility
     edit_commit_parser = subparsers.add_parser("edit-commit", help="Edit and commit a generated markdown file to a PR branch")
+    edit_commit_parser.add_argument("--search", default=None, help="Find the draft to commit by full-text search (title, repo, body)")
+    edit_commit_parser.add_argument("--watch", action="store_true", help="Keep running and commit each markdown file whenever it is saved")
+    edit_commit_parser.add_argument("--repo", default=None, help="GitHub repo name (default: the repo preference)")
+    edit_commit_parser.add_argument("--branch", default=None, help="PR branch to commit to")
+    edit_commit_parser.add_argument("--message", default=None, help="Commit message (default: Update blog post)")
+    edit_commit_parser.add_argument("--debounce", type=float, default=None, help="Seconds a file must stay quiet before it is committed")
+
+    # Batch Flow
+    batch_parser = subparsers.add_parser("batch", help="Generate drafts for many repos from a JSONL manifest")
+    batch_parser.add_argument("manifest", help="JSONL file, one job per line with repo_url and optional prompts")
+    batch_parser.add_argument("--workers", type=int, default=4, help="Jobs to run at once")
+    batch_parser.add_argument("--status-dir", default=None, help="Where per-job status files are kept")
+
+    # Publish
+    publish_parser = subparsers.add_parser("publish", help="Publish local drafts (and assets) to the blog repo as one commit and PR")
+    publish_parser.add_argument("drafts", nargs="+", help="Markdown files to publish under posts_dir")
+    publish_parser.add_argument("--asset", action="append", default=[], help="Image or other asset to publish under assets_dir (repeatable)")
+    publish_parser.add_argument("--branch", default=None, help="PR branch name (default: blog-posts-<timestamp>-auto)")
+    publish_parser.add_argument("--title", default=None, help="PR title")
+
+    # Profile
+    profile_parser = subparsers.add_parser("profile", help="Trace the blog pipeline for a repo and report per-node cost")
+    profile_parser.add_argument("repo_url", help="GitHub repo URL to generate a draft for")
+    profile_parser.add_argument("--notes", default="", help="Personal notes passed to the draft")
+    profile_parser.add_argument("--trace-file", default="trace.json", help="Where to write the Chrome trace JSON")
 
     args = parser.parse_args()
 
     if args.command == "qa":
         run_qa_flow()
     elif args.command == "blog":
-        run_blog_flow()
+        run_blog_flow(args.resume)
+    elif args.command == "batch":
+        run_batch_flow(args.manifest, args.workers, args.status_dir)
     elif args.command == "edit-commit":
-        run_edit_commit()
+        if args.watch:
+            run_edit_watch(args.repo, args.branch, args.message, args.debounce)
+        else:
+            run_edit_commit(args.search)
+    elif args.command == "publish":
+        run_publish(args.drafts, args.asset, args.branch, args.title)
+    elif args.command == "profile":
+        run_profile(args.repo_url, args.notes, args.trace_file)
     else:
         parser.print_help()
 
@@ -1,16 +1,31 @@
-from pocketflow import Node
-from utils.call_llm import call_llm
+from utils.tracing import TracedNode, in_current_context
+from utils.call_llm import call_llm, stream_llm
 from utils.github_utils import get_commit_history, get_readme_and_key_files, analyze_codebase
-from utils.blog_scraper import fetch_latest_blog, fetch_all_blogs
+from utils.commit_store import get_commit_store
+from utils.code_summarizer import summarize_codebase
+from utils.blog_scraper import load_blog_corpus, post_dates_by_repo
 from utils.style_analyzer import analyze_style, summarize_style_patterns
+from utils.blog_index import build_blog_index, search_blog_index, STYLE_EXEMPLAR_COUNT
 from utils.pr_creator import create_blog_file_and_pr
-from utils.web_search import search_duckduckgo
+from utils.draft_library import record_draft, set_draft_branch
+from utils.web_search import search_duckduckgo, fetch_page_text, WEB_CONCURRENCY, WEB_PER_HOST, WEB_ITEM_TIMEOUT
+from utils.parallel import map_bounded
+from utils.prompt_packer import (
+    pack_sections, estimate_tokens, format_pack_report, format_commits, format_changes_since, format_key_files,
+    format_codebase_overview, format_file_snippets, DRAFT_PROMPT_TOKEN_BUDGET, KEYWORD_PROMPT_TOKEN_BUDGET
+)
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
 import os
-import requests
-from bs4 import BeautifulSoup
+from rich import get_console
 import datetime
+import time
 
-class GetQuestionNode(Node):
+# The process-wide rich console, also used by main's progress bar, so node output from
+# concurrently running nodes is printed above the live display instead of through it
+console = get_console()
+
+class GetQuestionNode(TracedNode):
     def exec(self, _):
         # Get question directly from user input
         user_question = input("Enter your question: ")
@@ -21,7 +36,7 @@ class GetQuestionNode(Node):
         shared["question"] = exec_res
         return "default"  # Go to the next node
 
-class AnswerNode(Node):
+class AnswerNode(TracedNode):
     def prep(self, shared):
         # Read question from shared
         return shared["question"]
@@ -34,7 +49,10 @@ class AnswerNode(Node):
         # Store the answer in shared
         shared["answer"] = exec_res
 
-class InputGatherNode(Node):
+class InputGatherNode(TracedNode):
+    # Shared-store keys this node reads and writes; used by flow.run_dag to schedule nodes
+    reads = ()
+    writes = ("repo_url", "notes")
     def exec(self, _):
         repo_url = input("Enter the GitHub repo URL to summarize: ")
         notes = input("Any personal notes or anecdotes? (optional): ")
@@ -43,7 +61,10 @@ class InputGatherNode(Node):
         shared.update(exec_res)
         return "default"
 
-class RepoAnalyzerNode(Node):
+class RepoAnalyzerNode(TracedNode):
+    github_budget = 300
+    reads = ("repo_url",)
+    writes = ("repo_full_name", "commits", "readme", "key_files", "codebase_insights", "codebase_summary")
     def prep(self, shared):
         return shared["repo_url"]
     def exec(self, repo_url):
@@ -54,21 +75,33 @@ class RepoAnalyzerNode(Node):
         if not m:
             raise ValueError("Invalid GitHub repo URL format. Use https://github.com/owner/repo")
         repo_full_name = m.group(1)
-        commits = get_commit_history(repo_full_name)
-        readme, key_files = get_readme_and_key_files(repo_full_name)
-        codebase_insights = analyze_codebase(repo_full_name)
+        # README and key files are independent of the rest, so overlap them; the codebase
+        # analysis waits for the history sync, whose stored file stats tell it which files change most
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            readme_f = pool.submit(in_current_context(get_readme_and_key_files), repo_full_name)
+            commits = get_commit_history(repo_full_name)
+            codebase_insights = analyze_codebase(repo_full_name, churn=get_commit_store(repo_full_name).churn())
+            readme, key_files = readme_f.result()
+        console.print(f"[dim]Read {codebase_insights['bytes_downloaded']} bytes from "
+                      f"{len(codebase_insights['file_summaries'])} of {codebase_insights['all_files_count']} files[/dim]")
+        if codebase_insights["incomplete"]:
+            console.print(f"[yellow]Codebase analysis is partial: {codebase_insights['incomplete']}[/yellow]")
+        codebase_summary = summarize_codebase(codebase_insights["file_summaries"])
         return {
             "repo_full_name": repo_full_name,
             "commits": commits,
             "readme": readme,
             "key_files": key_files,
-            "codebase_insights": codebase_insights
+            "codebase_insights": codebase_insights,
+            "codebase_summary": codebase_summary
         }
     def post(self, shared, prep_res, exec_res):
         shared.update(exec_res)
         return "default"
 
-class WebContextNode(Node):
+class WebContextNode(TracedNode):
+    reads = ("readme", "commits", "notes", "user_urls")
+    writes = ("web_context",)
     def prep(self, shared):
         return {
             "readme": shared.get("readme", ""),
@@ -77,46 +110,64 @@ class WebContextNode(Node):
             "user_urls": shared.get("user_urls", []),
         }
     def exec(self, context):
-        # 1. Summarize user-provided URLs
-        url_summaries = []
-        for url in context["user_urls"]:
-            try:
-                resp = requests.get(url, timeout=10)
-                soup = BeautifulSoup(resp.text, "html.parser")
-                text = soup.get_text(separator="\n")
-                summary = call_llm(f"Summarize the following web page for a technical blog context:\n{text[:4000]}")
-                url_summaries.append(f"Summary of {url}:\n{summary}")
-            except Exception as e:
-                url_summaries.append(f"Could not fetch {url}: {e}")
-        # 2. Extract keywords/concepts from repo context
-        extract_prompt = f"""
+        # 1. Summarize user-provided URLs, in the background while keywords are extracted
+        urls = context["user_urls"]
+        def summarize_url(url):
+            text = fetch_page_text(url)
+            return call_llm(f"Summarize the following web page for a technical blog context:\n{text[:4000]}")
+        with ThreadPoolExecutor(max_workers=1) as background:
+            url_results_future = background.submit(
+                in_current_context(map_bounded), summarize_url, urls, max_workers=WEB_CONCURRENCY, timeout=WEB_ITEM_TIMEOUT,
+                key=lambda url: urlparse(url).netloc, per_key=WEB_PER_HOST
+            )
+            # 2. Extract keywords/concepts from repo context
+            sections = [
+                {"name": "notes", "priority": 1, "items": [context["notes"]]},
+                {"name": "readme", "priority": 2, "items": [context["readme"]]},
+                {"name": "commits", "priority": 3, "items": format_commits(context["commits"]), "separator": "\n"}
+            ]
+            def render(texts):
+                return f"""
 Given the following README, commit messages, and notes, extract a list of new technologies, libraries, frameworks, or concepts that should be explained or researched for a technical blog.
 
 README:
-{context['readme']}
+{texts['readme']}
 
 Commits:
-{context['commits']}
+{texts['commits']}
 
 Notes:
-{context['notes']}
+{texts['notes']}
 
 Return a YAML list of keywords/technologies.
 """
-        keywords_yaml = call_llm(extract_prompt)
-        import yaml
-        try:
-            keywords = yaml.safe_load(keywords_yaml)
-            if not isinstance(keywords, list):
+            reserved = estimate_tokens(render({section["name"]: "" for section in sections}))
+            extract_prompt = render(pack_sections(sections, KEYWORD_PROMPT_TOKEN_BUDGET, reserved)["texts"])
+            keywords_yaml = call_llm(extract_prompt)
+            import yaml
+            try:
+                keywords = yaml.safe_load(keywords_yaml)
+                if not isinstance(keywords, list):
+                    keywords = []
+            except Exception:
                 keywords = []
-        except Exception:
-            keywords = []
-        # 3. DuckDuckGo search for each keyword
-        keyword_summaries = []
-        for kw in keywords:
-            results = search_duckduckgo(kw)
-            summary = "\n".join(results)
-            keyword_summaries.append(f"Context for {kw}:\n{summary}")
+            # 3. DuckDuckGo search for each keyword; every search hits the same host
+            keyword_results = map_bounded(
+                search_duckduckgo, keywords, max_workers=WEB_CONCURRENCY, timeout=WEB_ITEM_TIMEOUT,
+                key=lambda _: "duckduckgo", per_key=WEB_PER_HOST
+            )
+            keyword_summaries = []
+            for kw, results in zip(keywords, keyword_results):
+                if isinstance(results, Exception):
+                    continue
+                summary = "\n".join(results)
+                keyword_summaries.append(f"Context for {kw}:\n{summary}")
+            url_summaries = []
+            for url, summary in zip(urls, url_results_future.result()):
+                if isinstance(summary, Exception):
+                    url_summaries.append(f"Could not fetch {url}: {summary}")
+                else:
+                    url_summaries.append(f"Summary of {url}:\n{summary}")
         # 4. Combine all context
         combined = "\n\n".join(url_summaries + keyword_summaries)
         return {"web_context": combined}
@@ -124,18 +175,28 @@ Return a YAML list of keywords/technologies.
         shared.update(exec_res)
         return "default"
 
-class BlogContextNode(Node):
+class BlogContextNode(TracedNode):
+    github_budget = 500
+    reads = ()
+    writes = ("latest_blog", "style_summary", "blog_index_dir", "repo_post_dates")
     def exec(self, _):
-        latest_blog = fetch_latest_blog()
-        all_blogs = fetch_all_blogs()
-        style_analysis = analyze_style(all_blogs)
+        # One snapshot of the posts directory serves both the latest post and the full corpus
+        corpus = load_blog_corpus()
+        if corpus["incomplete"]:
+            console.print(f"[yellow]Style analysis uses a partial blog corpus: {corpus['incomplete']}[/yellow]")
+        latest_blog = corpus["latest_blog"]
+        blog_index_dir = build_blog_index(corpus["blogs"])
+        style_analysis = analyze_style(corpus["blogs"])
         style_summary = summarize_style_patterns(style_analysis)
-        return {"latest_blog": latest_blog, "style_summary": style_summary}
+        return {"latest_blog": latest_blog, "style_summary": style_summary, "blog_index_dir": blog_index_dir,
+                "repo_post_dates": post_dates_by_repo(corpus["blogs"])}
     def post(self, shared, prep_res, exec_res):
         shared.update(exec_res)
         return "default"
 
-class PersonalPromptNode(Node):
+class PersonalPromptNode(TracedNode):
+    reads = ()
+    writes = ("extra",)
     def exec(self, _):
         extra = input("Anything else you'd like to add to the blog? (optional): ")
         return {"extra": extra}
@@ -143,7 +204,13 @@ class PersonalPromptNode(Node):
         shared.update(exec_res)
         return "default"
 
-class BlogDraftGeneratorNode(Node):
+class BlogDraftGeneratorNode(TracedNode):
+    reads = (
+        "repo_url", "repo_full_name", "commits", "readme", "key_files", "codebase_insights", "codebase_summary", "notes", "extra", "series",
+        "is_new_series", "emotions", "takeaway", "anecdotes", "opening_line", "system_prompt",
+        "latest_blog", "style_summary", "blog_index_dir", "repo_post_dates", "web_context", "run_id"
+    )
+    writes = ("blog_draft", "blog_file_path", "draft_timing", "prompt_report")
     def prep(self, shared):
         return {
             "repo_url": shared["repo_url"],
@@ -151,6 +218,7 @@ class BlogDraftGeneratorNode(Node):
             "readme": shared["readme"],
             "key_files": shared["key_files"],
             "codebase_insights": shared.get("codebase_insights", {}),
+            "codebase_summary": shared.get("codebase_summary", ""),
             "notes": shared.get("notes", ""),
             "extra": shared.get("extra", ""),
             "series": shared.get("series", ""),
@@ -162,26 +230,88 @@ class BlogDraftGeneratorNode(Node):
             "system_prompt": shared.get("system_prompt", ""),
             "latest_blog": shared["latest_blog"],
             "style_summary": shared["style_summary"],
-            "web_context": shared.get("web_context", "")
+            "blog_index_dir": shared.get("blog_index_dir"),
+            "web_context": shared.get("web_context", ""),
+            "repo_full_name": shared.get("repo_full_name"),
+            "run_id": shared.get("run_id"),
+            "last_post_date": shared.get("repo_post_dates", {}).get(shared.get("repo_full_name"))
         }
     def exec(self, context):
         system_prompt = context.get("system_prompt", "")
-        prompt = f"""
-{system_prompt}\n\nYou are Harish, a developer who writes personal, story-driven, and technical blogs.\n\nWrite a new blog post about the project at {context['repo_url']} in your style.\n\nProject context:\nREADME:\n{context['readme']}\n\nKey files:\n{context['key_files']}\n\nCommit history highlights:\n{context['commits']}\n\nCodebase insights:\n{context['codebase_insights']}\n\nPersonal notes:\n{context['notes']}\n\nExtra anecdotes:\n{context['extra']}\n\nPersonal context:\n- Series: {context['series']}\n- Is this a new series: {context['is_new_series']}\n- Emotions/mood: {context['emotions']}\n- Message/takeaway: {context['takeaway']}\n- Anecdotes/meta: {context['anecdotes']}\n\nOpening line/tone: {context['opening_line']}\nIf provided, start the blog with this line or closely match its tone and style.\n\nExtra context from related blogs and web resources:\n{context.get('web_context', '')}\n\nStyle guide:\n{context['style_summary']}\n\nUse the following blog as a style template:\n---\n{context['latest_blog']}\n---\n\nWrite the blog in a way that strongly reflects the above personal context and emotions. Let the author's voice and feelings shine through, as in their previous blogs.\n"""
-        blog_draft = call_llm(prompt)
-        # Save to local .md file in contents dir
+        insights = context["codebase_insights"]
+        # What changed since we last wrote about this repo, from the local commit store (no API calls)
+        since = context["last_post_date"]
+        changes_since = get_commit_store(context["repo_full_name"]).commits(since=since) if since else []
+        # Style exemplars: the past passages most relevant to this project, or the latest post as a fallback
+        query = "\n".join([context["repo_url"], context["readme"], context["codebase_summary"], context["notes"]])
+        passages = search_blog_index(query, k=STYLE_EXEMPLAR_COUNT, index_dir=context["blog_index_dir"])
+        exemplars = [p["text"] for p in passages] or [context["latest_blog"]]
+        # Pack the bulky context into the token budget, most important sections first
+        sections = [
+            {"name": "readme", "priority": 1, "items": [context["readme"]]},
+            {"name": "commits", "priority": 2, "items": format_commits(context["commits"]), "separator": "\n"},
+            {"name": "changes_since_last_post", "priority": 2, "items": format_changes_since(changes_since, since), "separator": "\n"},
+            {"name": "style_summary", "priority": 3, "items": [context["style_summary"]]},
+            {"name": "style_examples", "priority": 4, "items": exemplars, "separator": "\n---\n"},
+            {"name": "codebase_summary", "priority": 5, "items": [context["codebase_summary"]]},
+            {"name": "codebase_overview", "priority": 5, "items": [format_codebase_overview(insights)]},
+            {"name": "key_files", "priority": 6, "items": format_key_files(context["key_files"])},
+            {"name": "web_context", "priority": 7, "items": context.get("web_context", "").split("\n\n")},
+            {"name": "file_snippets", "priority": 8, "items": format_file_snippets(insights)}
+        ]
+        def render(texts):
+            return f"""
+{system_prompt}\n\nYou are Harish, a developer who writes personal, story-driven, and technical blogs.\n\nWrite a new blog post about the project at {context['repo_url']} in your style.\n\nProject context:\nREADME:\n{texts['readme']}\n\nKey files:\n{texts['key_files']}\n\nCommit history highlights:\n{texts['commits']}\n\nChanges since the last post about this project:\n{texts['changes_since_last_post']}\n\nCodebase overview:\n{texts['codebase_summary']}\n\nCodebase insights:\n{texts['codebase_overview']}\n\nNotable file snippets:\n{texts['file_snippets']}\n\nPersonal notes:\n{context['notes']}\n\nExtra anecdotes:\n{context['extra']}\n\nPersonal context:\n- Series: {context['series']}\n- Is this a new series: {context['is_new_series']}\n- Emotions/mood: {context['emotions']}\n- Message/takeaway: {context['takeaway']}\n- Anecdotes/meta: {context['anecdotes']}\n\nOpening line/tone: {context['opening_line']}\nIf provided, start the blog with this line or closely match its tone and style.\n\nExtra context from related blogs and web resources:\n{texts['web_context']}\n\nStyle guide:\n{texts['style_summary']}\n\nUse the following passages from previous blogs as a style template:\n---\n{texts['style_examples']}\n---\n\nWrite the blog in a way that strongly reflects the above personal context and emotions. Let the author's voice and feelings shine through, as in their previous blogs.\n"""
+        reserved = estimate_tokens(render({section["name"]: "" for section in sections}))
+        packed = pack_sections(sections, DRAFT_PROMPT_TOKEN_BUDGET, reserved)
+        prompt = render(packed["texts"])
+        console.print(f"[dim]{format_pack_report(packed)}[/dim]")
+        # Stream the draft: render chunks live and write them through to disk, so an
+        # interrupted run still leaves the partial draft in contents/.
+        # Params (set by batch runs): live_output=False to stay quiet, draft_name to pick the file name.
+        live_output = self.params.get("live_output", True)
         os.makedirs("contents", exist_ok=True)
-        title = f"blog_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
+        title = self.params.get("draft_name") or f"blog_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
         file_path = os.path.join("contents", title)
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(blog_draft)
-        return {"blog_draft": blog_draft, "blog_file_path": file_path}
+        chunks = []
+        # Streamed text is printed a line at a time: a partial line would be split by the progress bar redraw
+        pending = ""
+        start = time.perf_counter()
+        first_token_time = None
+        try:
+            with open(file_path, "w", encoding="utf-8") as f:
+                for chunk in stream_llm(prompt):
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter() - start
+                    chunks.append(chunk)
+                    f.write(chunk)
+                    f.flush()
+                    if live_output:
+                        lines, _, pending = (pending + chunk).rpartition("\n")
+                        if lines:
+                            console.print(lines, markup=False, highlight=False)
+        except BaseException:
+            console.print(f"[red]Draft generation interrupted; partial draft kept at {file_path}[/red]")
+            raise
+        total_time = time.perf_counter() - start
+        record_draft(file_path, "".join(chunks), repo=context["repo_full_name"], run_id=context["run_id"])
+        if live_output and pending:
+            console.print(pending, markup=False, highlight=False)
+        console.print(f"[dim]Time to first token: {first_token_time or 0:.2f}s, total generation: {total_time:.2f}s[/dim]")
+        return {
+            "blog_draft": "".join(chunks),
+            "blog_file_path": file_path,
+            "draft_timing": {"time_to_first_token": first_token_time, "total_time": total_time},
+            "prompt_report": {key: packed[key] for key in ("tokens", "budget", "dropped", "truncated")}
+        }
     def post(self, shared, prep_res, exec_res):
         shared.update(exec_res)
-        print(f"Blog draft saved to {exec_res['blog_file_path']}")
+        console.print(f"Blog draft saved to {exec_res['blog_file_path']}")
         return "default"
 
-class ReviewAndEditNode(Node):
+class ReviewAndEditNode(TracedNode):
+    reads = ("blog_draft",)
+    writes = ("final_blog",)
     def prep(self, shared):
         return shared["blog_draft"]
     def exec(self, blog_draft):
@@ -194,11 +324,14 @@ class ReviewAndEditNode(Node):
         shared["final_blog"] = exec_res
         return "default"
 
-class PRCreatorNode(Node):
+class PRCreatorNode(TracedNode):
+    github_budget = 20
+    reads = ("final_blog", "repo_url", "blog_file_path")
+    writes = ("pr_url",)
     def prep(self, shared):
-        return shared["final_blog"], shared["repo_url"]
+        return shared["final_blog"], shared["repo_url"], shared.get("blog_file_path")
     def exec(self, inputs):
-        blog_markdown, repo_url = inputs
+        blog_markdown, repo_url, blog_file_path = inputs
         blog_title = input("Enter a title for the blog post: ")
         # Make branch name unique by appending timestamp
         timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
@@ -206,8 +339,10 @@ class PRCreatorNode(Node):
         pr_title = f"Add blog: {blog_title}"
         pr_body = "Automated blog post PR. Please review."
         pr_url = create_blog_file_and_pr(blog_markdown, blog_title, branch_name, pr_title, pr_body)
+        if blog_file_path:
+            set_draft_branch(blog_file_path, branch_name)
         return {"pr_url": pr_url}
     def post(self, shared, prep_res, exec_res):
         shared.update(exec_res)
-        print(f"Pull Request created: {exec_res['pr_url']}")
+        console.print(f"Pull Request created: {exec_res['pr_url']}")
         return None
\ No newline at end of file
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import zlib
+
+import numpy as np
+
+from utils.tracing import traced
+
+# Local retrieval index over past posts, used to pick style exemplars for the draft prompt
+BLOG_INDEX_DIR = os.environ.get("BLOG_INDEX_DIR", os.path.join(".cache", "blog_index"))
+EMBEDDING_DIM = 2048
+CHUNK_WORDS = 180
+# Passages handed to the draft prompt as style examples
+STYLE_EXEMPLAR_COUNT = int(os.environ.get("STYLE_EXEMPLAR_COUNT", "4"))
+
+TOKEN_PATTERN = re.compile(r"\b\w+\b")
+
+def chunk_post(content, max_words=CHUNK_WORDS):
+    """Split a post into passages of whole paragraphs, about max_words words each."""
+    chunks = []
+    current = []
+    words = 0
+    for paragraph in re.split(r"\n\s*\n", content):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        n = len(paragraph.split())
+        if current and words + n > max_words:
+            chunks.append("\n\n".join(current))
+            current = []
+            words = 0
+        current.append(paragraph)
+        words += n
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def embed(texts, dim=EMBEDDING_DIM):
+    """
+    Hashing-trick embeddings: unigrams and bigrams hashed (crc32, stable across runs) into dim
+    signed buckets, sublinear term frequency, L2-normalized rows. Returns a float32 matrix.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        if not features:
+            continue
+        hashes = np.fromiter((zlib.crc32(f.encode()) for f in features), dtype=np.uint32, count=len(features))
+        buckets = (hashes % dim).astype(np.int64)
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(matrix[row], buckets, signs)
+    matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+def _corpus_key(blogs):
+    keys = [b.get("sha") or hashlib.sha1(b["content"].encode()).hexdigest() for b in blogs]
+    return hashlib.sha1("\n".join(keys).encode()).hexdigest()
+
+def _current_version(index_dir):
+    try:
+        with open(os.path.join(index_dir, "CURRENT"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+def _write_atomic(path, text):
+    # A unique temp file in the same directory, so concurrent writers never share one
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+@traced()
+def build_blog_index(blogs, index_dir=None):
+    """
+    Chunk and embed every post and store the vectors as a raw float32 file for memory mapping,
+    with passage metadata alongside, in a directory named after the corpus; the CURRENT file is
+    then switched to it in one step, so readers never mix vectors and metadata of different builds.
+    Skipped when the current index was built from the same posts. Returns the index directory.
+    """
+    index_dir = index_dir or BLOG_INDEX_DIR
+    corpus_key = _corpus_key(blogs)
+    if _current_version(index_dir) == corpus_key and os.path.isdir(os.path.join(index_dir, corpus_key)):
+        return index_dir
+    os.makedirs(index_dir, exist_ok=True)
+    chunks = []
+    for blog in blogs:
+        for i, text in enumerate(chunk_post(blog["content"])):
+            chunks.append({"name": blog.get("name", ""), "chunk": i, "text": text})
+    vectors = embed([c["text"] for c in chunks])
+    build_dir = tempfile.mkdtemp(dir=index_dir, prefix=".build-")
+    vectors.tofile(os.path.join(build_dir, "vectors.f32"))
+    with open(os.path.join(build_dir, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump({"corpus_key": corpus_key, "dim": EMBEDDING_DIM, "chunks": chunks}, f)
+    try:
+        os.rename(build_dir, os.path.join(index_dir, corpus_key))
+    except OSError:
+        # Another worker already built this corpus
+        shutil.rmtree(build_dir, ignore_errors=True)
+    _write_atomic(os.path.join(index_dir, "CURRENT"), corpus_key)
+    # Older builds are dropped (but not one another worker just switched to); a reader still on
+    # one just finds no exemplars this time
+    keep = {corpus_key, _current_version(index_dir)}
+    for name in os.listdir(index_dir):
+        if name not in keep and len(name) == 40 and os.path.isdir(os.path.join(index_dir, name)):
+            shutil.rmtree(os.path.join(index_dir, name), ignore_errors=True)
+    return index_dir
+
+@traced()
+def search_blog_index(query, k=4, index_dir=None):
+    """Top-k passages most similar to query, as [{"name", "chunk", "text", "score"}], best first."""
+    index_dir = index_dir or BLOG_INDEX_DIR
+    version = _current_version(index_dir)
+    if version is None or not query.strip():
+        return []
+    version_dir = os.path.join(index_dir, version)
+    try:
+        with open(os.path.join(version_dir, "chunks.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        chunks = meta["chunks"]
+        if not chunks:
+            return []
+        vectors_path = os.path.join(version_dir, "vectors.f32")
+        shape = (len(chunks), meta["dim"])
+        # A vectors file that doesn't match its metadata is treated as no index, not an error
+        if os.path.getsize(vectors_path) != shape[0] * shape[1] * np.dtype(np.float32).itemsize:
+            return []
+        vectors = np.memmap(vectors_path, dtype=np.float32, mode="r", shape=shape)
+    except (OSError, ValueError, KeyError):
+        return []
+    scores = vectors @ embed([query], meta["dim"])[0]
+    k = min(k, len(chunks))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [{**chunks[i], "score": float(scores[i])} for i in top]
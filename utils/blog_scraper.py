@@ -1,55 +1,128 @@
-from github import Github
+from utils.github_client import get_repo
+from utils.github_utils import fetch_blob_texts
+from utils.rate_limit import GitHubBudgetExceeded
+from utils.tracing import traced
+from github import GithubException, UnknownObjectException
+import json
 import os
+import re
+import threading
+import time
 
-def get_github_client():
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        raise Exception("Please set the GITHUB_TOKEN environment variable.")
-    return Github(token)
+BLOG_REPO = "harish876/harish876.github.io"
+POSTS_DIR = "content/posts"
+# Number of post paths looked up per GraphQL request
+DATES_BATCH_SIZE = 50
+GITHUB_REPO_LINK = re.compile(r"github\.com/([\w.-]+/[\w.-]+)")
+# Seconds fetch_all_blogs/fetch_latest_blog reuse one corpus snapshot before loading it again
+BLOG_CORPUS_TTL = float(os.environ.get("BLOG_CORPUS_TTL", "300"))
 
-def fetch_all_blogs():
-    """Fetch all blog posts as a list of texts from the content/posts directory of the blog repo."""
-    g = get_github_client()
-    repo = g.get_repo("harish876/harish876.github.io")
-    posts_dir = "content/posts"
+_lock = threading.Lock()
+_corpus = None
+_corpus_loaded_at = 0.0
+
+@traced("github")
+def _last_modified_dates(repo, paths):
+    """
+    Return {path: ISO date of the last commit touching it} using batched GraphQL
+    history lookups, one request per DATES_BATCH_SIZE posts. Posts in a batch whose
+    query fails are left undated rather than failing the whole corpus.
+    """
+    owner, name = repo.full_name.split("/")
+    dates = {}
+    for start in range(0, len(paths), DATES_BATCH_SIZE):
+        batch = paths[start:start + DATES_BATCH_SIZE]
+        fields = " ".join(
+            f"p{i}: history(first: 1, path: {json.dumps(path)}) {{ nodes {{ committedDate }} }}"
+            for i, path in enumerate(batch)
+        )
+        query = (
+            "query($owner: String!, $name: String!) { repository(owner: $owner, name: $name) { "
+            f"defaultBranchRef {{ target {{ ... on Commit {{ {fields} }} }} }} }} }}"
+        )
+        try:
+            _, data = repo.requester.graphql_query(query, {"owner": owner, "name": name})
+            target = data["data"]["repository"]["defaultBranchRef"]["target"]
+        except (GithubException, KeyError, TypeError):
+            continue
+        for i, path in enumerate(batch):
+            nodes = (target.get(f"p{i}") or {}).get("nodes") or []
+            if nodes:
+                dates[path] = nodes[0]["committedDate"]
+    return dates
+
+@traced("github")
+def load_blog_corpus():
+    """
+    Snapshot the blog repo's posts directory in one pass: one directory listing,
+    parallel blob downloads and batched last-modified dates.
+    Returns {"blogs": [...], "latest_blog": str}; each blog dict carries name, content,
+    path, sha and last_modified (ISO date, or None if unknown). If the GitHub budget runs
+    out while downloading, the corpus holds the posts fetched so far and "incomplete" says why.
+    """
+    repo = get_repo(BLOG_REPO)
     try:
-        contents = repo.get_contents(posts_dir)
-    except Exception:
-        return []
+        contents = repo.get_contents(POSTS_DIR)
+    except UnknownObjectException:
+        return {"blogs": [], "latest_blog": "", "incomplete": None}
+    posts = [f for f in contents if f.type == "file" and f.name.endswith(".md")]
+    dates = _last_modified_dates(repo, [f.path for f in posts])
+    # Newest first, so a budget cut-off loses the oldest posts rather than the latest one
+    posts.sort(key=lambda f: dates.get(f.path) or "", reverse=True)
     blogs = []
-    for file in contents:
-        if file.type == "file" and file.name.endswith(".md"):
-            try:
-                text = file.decoded_content.decode(errors='ignore')
-                blogs.append({
-                    "name": file.name,
-                    "content": text,
-                    "path": file.path,
-                    "sha": file.sha
-                })
-            except Exception:
-                continue
-    return blogs
-
-def fetch_latest_blog():
-    """Fetch the latest blog post (by last commit date) from the content/posts directory."""
-    blogs = fetch_all_blogs()
+    incomplete = None
+    texts = fetch_blob_texts(repo, [f.sha for f in posts])
+    try:
+        for file, text in zip(posts, texts):
+            blogs.append({
+                "name": file.name,
+                "content": text,
+                "path": file.path,
+                "sha": file.sha,
+                "last_modified": dates.get(file.path)
+            })
+    except GitHubBudgetExceeded as e:
+        incomplete = f"{e}; loaded {len(blogs)} of {len(posts)} posts"
     if not blogs:
-        return ""
-    # Use the GitHub API to get the latest commit date for each file
-    g = get_github_client()
-    repo = g.get_repo("harish876/harish876.github.io")
-    latest_blog = None
-    latest_date = None
+        return {"blogs": [], "latest_blog": "", "incomplete": incomplete}
+    dated = [b for b in blogs if b["last_modified"]]
+    latest = max(dated, key=lambda b: b["last_modified"]) if dated else blogs[0]
+    return {"blogs": blogs, "latest_blog": latest["content"], "incomplete": incomplete}
+
+def post_dates_by_repo(blogs):
+    """{owner/repo: last_modified of the newest post linking to it on GitHub}."""
+    dates = {}
     for blog in blogs:
-        try:
-            commits = repo.get_commits(path=blog["path"])
-            commit = next(commits, None)
-            if commit:
-                commit_date = commit.commit.author.date
-                if latest_date is None or commit_date > latest_date:
-                    latest_date = commit_date
-                    latest_blog = blog["content"]
-        except Exception:
+        if not blog["last_modified"]:
             continue
-    return latest_blog or blogs[0]["content"] 
\ No newline at end of file
+        for link in set(GITHUB_REPO_LINK.findall(blog["content"])):
+            # Links often end a sentence or point at the clone URL
+            repo_name = link.rstrip(".").removesuffix(".git")
+            dates[repo_name] = max(dates.get(repo_name, ""), blog["last_modified"])
+    return dates
+
+def _shared_corpus():
+    # The two wrappers below share one snapshot for BLOG_CORPUS_TTL seconds instead of each
+    # downloading every post; a snapshot cut short by the budget is not kept, so the next call tries again
+    global _corpus, _corpus_loaded_at
+    with _lock:
+        if _corpus is None or time.monotonic() - _corpus_loaded_at > BLOG_CORPUS_TTL:
+            corpus = load_blog_corpus()
+            if corpus["incomplete"]:
+                return corpus
+            _corpus, _corpus_loaded_at = corpus, time.monotonic()
+        return _corpus
+
+def reset_blog_corpus():
+    """Drop the shared snapshot, so the next fetch_all_blogs/fetch_latest_blog reloads the posts."""
+    global _corpus
+    with _lock:
+        _corpus = None
+
+def fetch_all_blogs():
+    """All blog posts (see load_blog_corpus, which new code should call directly)."""
+    return _shared_corpus()["blogs"]
+
+def fetch_latest_blog():
+    """The latest blog post's text, from the same snapshot as fetch_all_blogs."""
+    return _shared_corpus()["latest_blog"]
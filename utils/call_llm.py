@@ -1,21 +1,131 @@
 import google.generativeai as genai
+from utils.llm_cache import LLMCache
+from utils.tracing import span, tracer
+import hashlib
 import os
+import threading
+import time
 
 # # Learn more about calling the LLM: https://the-pocket.github.io/PocketFlow/utility_function/llm.html
-# def call_llm(prompt):    
+# def call_llm(prompt):
 #     client = OpenAI(api_key=os.environ.get("OPENAI_API_KEY", "your-api-key"))
 #     r = client.chat.completions.create(
 #         model="gpt-4o",
 #         messages=[{"role": "user", "content": prompt}]
 #     )
 #     return r.choices[0].message.content
-    
-def call_llm(prompt):
+
+LLM_MODEL = os.environ.get("LLM_MODEL", "gemini-2.5-flash")
+# "gemini", or "fake" for a deterministic offline stand-in
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+FAKE_LLM_LATENCY = float(os.environ.get("FAKE_LLM_LATENCY", "0"))
+# Process-wide cap on LLM calls in flight, shared by every node and batch job
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))
+
+# Response cache settings
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE", "1") != "0"
+LLM_CACHE_DIR = os.environ.get("LLM_CACHE_DIR", os.path.join(".cache", "llm"))
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", "256"))
+# Most responses kept on disk; expired rows are dropped regardless
+LLM_CACHE_DISK_ENTRIES = int(os.environ.get("LLM_CACHE_DISK_ENTRIES", "10000"))
+
+_cache = None
+_cache_lock = threading.Lock()
+_llm_slots = threading.BoundedSemaphore(LLM_MAX_CONCURRENCY)
+
+def get_llm_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(LLM_CACHE_DIR, LLM_CACHE_TTL, LLM_CACHE_MEMORY_ENTRIES, LLM_CACHE_DISK_ENTRIES)
+        return _cache
+
+def get_llm_cache_stats():
+    """Cache hits, tokens saved and latency saved by the LLM response cache in this process."""
+    return dict(get_llm_cache().stats)
+
+def _fake_text(prompt):
+    # A short YAML list, so callers that parse structured output (e.g. keyword extraction) still get items
+    digest = hashlib.sha256(prompt.encode()).hexdigest()[:12]
+    return f"- fake response {digest}\n- {len(prompt)} prompt chars"
+
+def fake_llm(prompt):
+    """Deterministic offline stand-in for Gemini: same prompt, same answer."""
+    if FAKE_LLM_LATENCY:
+        time.sleep(FAKE_LLM_LATENCY)
+    return _fake_text(prompt)
+
+def _generate(prompt, generation_config):
+    """Call the configured backend; returns (text, total tokens used)."""
+    with _llm_slots:
+        return _generate_unbounded(prompt, generation_config)
+
+def _generate_unbounded(prompt, generation_config):
+    if LLM_BACKEND == "fake":
+        text = fake_llm(prompt)
+        return text, (len(prompt) + len(text)) // 4
     api_key = os.environ.get("GOOGLE_API_KEY", "your-api-key")
     genai.configure(api_key=api_key)
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    response = model.generate_content(prompt)
-    return response.text
+    model = genai.GenerativeModel(LLM_MODEL)
+    response = model.generate_content(prompt, generation_config=generation_config or None)
+    usage = getattr(response, "usage_metadata", None)
+    tokens = getattr(usage, "total_token_count", 0) or (len(prompt) + len(response.text)) // 4
+    return response.text, tokens
+
+def stream_llm(prompt, **generation_config):
+    """Stream the response to prompt, yielding text chunks as they arrive. Streams are never cached."""
+    with span("stream_llm", "llm", prompt_chars=len(prompt)) as args:
+        response_chars = 0
+        with _llm_slots:
+            for chunk in _stream_unbounded(prompt, generation_config):
+                response_chars += len(chunk)
+                yield chunk
+        args.update(response_chars=response_chars)
+        tracer.count(llm_calls=1, llm_prompt_chars=len(prompt), llm_response_chars=response_chars)
+
+def _stream_unbounded(prompt, generation_config):
+    if LLM_BACKEND == "fake":
+        words = _fake_text(prompt).split(" ")
+        for i, word in enumerate(words):
+            if FAKE_LLM_LATENCY:
+                time.sleep(FAKE_LLM_LATENCY / len(words))
+            yield word if i == 0 else " " + word
+        return
+    api_key = os.environ.get("GOOGLE_API_KEY", "your-api-key")
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(LLM_MODEL)
+    for chunk in model.generate_content(prompt, generation_config=generation_config or None, stream=True):
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. the final finish-reason chunk)
+            continue
+        if text:
+            yield text
+
+def call_llm(prompt, use_cache=True, **generation_config):
+    """
+    Send prompt to the LLM. Responses are cached by a hash of model, generation params and prompt;
+    pass use_cache=False to bypass the cache for calls that should not repeat (e.g. drafts).
+    """
+    with span("call_llm", "llm", prompt_chars=len(prompt)) as args:
+        if not (use_cache and LLM_CACHE_ENABLED):
+            text = _generate(prompt, generation_config)[0]
+            cached = None
+        else:
+            cache = get_llm_cache()
+            key = cache.make_key(f"{LLM_BACKEND}:{LLM_MODEL}", generation_config, prompt)
+            cached = cache.get(key)
+            text = cached
+            if cached is None:
+                start = time.perf_counter()
+                text, tokens = _generate(prompt, generation_config)
+                cache.put(key, text, tokens, time.perf_counter() - start)
+        args.update(response_chars=len(text), cache_hit=cached is not None)
+        tracer.count(llm_calls=1, llm_cache_hits=int(cached is not None),
+                     llm_prompt_chars=len(prompt), llm_response_chars=len(text))
+        return text
 
 if __name__ == "__main__":
     prompt = "What is the meaning of life?"
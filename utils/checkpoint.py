@@ -0,0 +1,98 @@
+import datetime
+import hashlib
+import inspect
+import json
+import os
+import secrets
+
+# Where per-run checkpoints of the shared store are kept
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", ".checkpoints")
+# Bump to invalidate every existing checkpoint (e.g. when the file layout changes)
+CHECKPOINT_FORMAT = 1
+
+def new_run_id():
+    return f"{datetime.datetime.now().strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(2)}"
+
+def _digest(value):
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+def node_code_version(node):
+    """Hash of the node class source, so editing a node invalidates its checkpoints."""
+    try:
+        source = inspect.getsource(type(node))
+    except (OSError, TypeError):
+        source = type(node).__qualname__
+    return _digest([CHECKPOINT_FORMAT, source])
+
+class RunCheckpoint:
+    """
+    JSON checkpoints of the shared store for one run (<CHECKPOINT_DIR>/<run id>/).
+    After a node finishes, the keys it writes are saved together with a hash of the keys it
+    reads and of its code. restore() only reuses a checkpoint when both still match, so a
+    resumed run skips up-to-date nodes and re-runs the first stale or failed one onwards.
+    """
+    def __init__(self, run_id, root=None):
+        self.run_id = run_id
+        self.dir = os.path.join(root or CHECKPOINT_DIR, run_id)
+
+    def exists(self):
+        return os.path.exists(os.path.join(self.dir, "inputs.json"))
+
+    def _write(self, name, data):
+        os.makedirs(self.dir, exist_ok=True)
+        path = os.path.join(self.dir, name)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(data, f, default=str)
+        os.replace(path + ".tmp", path)
+
+    def _read(self, name):
+        try:
+            with open(os.path.join(self.dir, name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_inputs(self, shared):
+        """Record the run's starting shared store, so --resume doesn't ask for it again."""
+        self._write("inputs.json", {"format": CHECKPOINT_FORMAT, "shared": shared})
+
+    def load_inputs(self):
+        data = self._read("inputs.json")
+        if not data or data.get("format") != CHECKPOINT_FORMAT:
+            return None
+        return data["shared"]
+
+    def _inputs_hash(self, node, shared):
+        reads = getattr(node, "reads", None)
+        if reads is None:
+            return _digest(shared)
+        return _digest({key: shared.get(key) for key in reads})
+
+    def save(self, node, shared):
+        writes = getattr(node, "writes", None)
+        if writes is None:
+            return
+        self._write(f"{type(node).__name__}.json", {
+            "format": CHECKPOINT_FORMAT,
+            "code_version": node_code_version(node),
+            "inputs_hash": self._inputs_hash(node, shared),
+            "outputs": {key: shared[key] for key in writes if key in shared}
+        })
+
+    def restore(self, node, shared):
+        """Copy the node's saved outputs into shared if they are still valid; returns True if restored."""
+        data = self._read(f"{type(node).__name__}.json")
+        if (not data or data.get("format") != CHECKPOINT_FORMAT
+                or data.get("code_version") != node_code_version(node)
+                or data.get("inputs_hash") != self._inputs_hash(node, shared)):
+            return False
+        shared.update(data["outputs"])
+        return True
+
+    def run_node(self, node, shared):
+        """Run node unless a valid checkpoint exists; returns True if it was restored instead."""
+        if self.restore(node, shared):
+            return True
+        node.run(shared)
+        self.save(node, shared)
+        return False
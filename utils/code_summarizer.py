@@ -0,0 +1,154 @@
+from utils.call_llm import call_llm
+from utils.parallel import map_bounded
+from utils.prompt_packer import estimate_tokens, truncate_to_tokens
+from utils.tracing import traced
+from contextlib import closing
+import os
+import sqlite3
+import threading
+import time
+import yaml
+
+# Per-file summaries keyed by git blob sha, so unchanged files are never summarized twice
+FILE_SUMMARY_CACHE_PATH = os.environ.get("FILE_SUMMARY_CACHE_PATH", os.path.join(".cache", "file_summaries.sqlite3"))
+# Summaries unused for this long are dropped, and at most this many are kept (least recently used go first)
+FILE_SUMMARY_CACHE_TTL = float(os.environ.get("FILE_SUMMARY_CACHE_TTL", str(30 * 24 * 3600)))
+FILE_SUMMARY_CACHE_ENTRIES = int(os.environ.get("FILE_SUMMARY_CACHE_ENTRIES", "20000"))
+# Target prompt size for each map / reduce LLM call
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", "3000"))
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", "4"))
+
+_cache_lock = threading.Lock()
+
+def _open_summary_cache(path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    db = sqlite3.connect(path, timeout=30)
+    db.execute("CREATE TABLE IF NOT EXISTS summaries (sha TEXT PRIMARY KEY, summary TEXT, used_at REAL)")
+    db.execute("CREATE INDEX IF NOT EXISTS summaries_used_at ON summaries (used_at)")
+    return db
+
+def load_file_summaries(shas, path=None):
+    """Cached summaries for the given blob shas, as {sha: summary}; marks them as just used."""
+    shas = list(dict.fromkeys(s for s in shas if s))
+    found = {}
+    with _cache_lock, closing(_open_summary_cache(path or FILE_SUMMARY_CACHE_PATH)) as db:
+        # Batched to stay under SQLite's bound-parameter limit
+        for i in range(0, len(shas), 500):
+            batch = shas[i:i + 500]
+            marks = ",".join("?" * len(batch))
+            found.update(db.execute(f"SELECT sha, summary FROM summaries WHERE sha IN ({marks})", batch).fetchall())
+            db.execute(f"UPDATE summaries SET used_at = ? WHERE sha IN ({marks})", [time.time(), *batch])
+        db.commit()
+    return found
+
+def save_file_summaries(summaries, path=None):
+    """Store {sha: summary}, then drop summaries past FILE_SUMMARY_CACHE_TTL and beyond FILE_SUMMARY_CACHE_ENTRIES."""
+    now = time.time()
+    with _cache_lock, closing(_open_summary_cache(path or FILE_SUMMARY_CACHE_PATH)) as db:
+        db.executemany("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?)",
+                       [(sha, summary, now) for sha, summary in summaries.items()])
+        db.execute("DELETE FROM summaries WHERE used_at < ?", (now - FILE_SUMMARY_CACHE_TTL,))
+        db.execute("DELETE FROM summaries WHERE sha IN "
+                   "(SELECT sha FROM summaries ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (FILE_SUMMARY_CACHE_ENTRIES,))
+        db.commit()
+
+def chunk_by_tokens(texts, max_tokens):
+    """Group texts into consecutive chunks whose estimated size stays under max_tokens."""
+    chunks = []
+    current = []
+    size = 0
+    for text in texts:
+        cost = estimate_tokens(text)
+        if current and size + cost > max_tokens:
+            chunks.append(current)
+            current = []
+            size = 0
+        current.append(text)
+        size += cost
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _parse_yaml_mapping(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = "\n".join(line for line in text.splitlines() if not line.startswith("```"))
+    try:
+        data = yaml.safe_load(text)
+    except yaml.YAMLError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+def _summarize_files(files):
+    """Map step: one LLM call summarizing a chunk of files; returns {path: summary}."""
+    blocks = "\n\n".join(f"FILE: {f['path']}\n```\n{f['snippet']}\n```" for f in files)
+    prompt = f"""
+Summarize what each of the following source files does, in one sentence each.
+Return a YAML mapping from file path to summary and nothing else.
+
+{blocks}
+"""
+    summaries = _parse_yaml_mapping(call_llm(prompt))
+    return {str(path): str(summary) for path, summary in summaries.items()}
+
+def _reduce_summaries(lines):
+    """Reduce step: merge a chunk of summary lines into one short overview."""
+    joined = "\n".join(lines)
+    prompt = f"""
+The following are summaries of parts of one code repository.
+Combine them into a concise overview (at most one paragraph) of what this part of the codebase does and how it fits together.
+
+{joined}
+"""
+    return call_llm(prompt).strip()
+
+@traced()
+def summarize_codebase(file_summaries, chunk_tokens=None, max_workers=None, cache_path=None):
+    """
+    Map-reduce summary of a repo from analyze_codebase's file_summaries (path, sha, snippet).
+    Map: files are batched into token-sized chunks and summarized by parallel LLM calls; each
+    summary is cached by blob sha, so only new or changed files are sent to the LLM.
+    Reduce: the per-file summaries are merged chunk by chunk, level by level, into one overview.
+    Adds a "summary" key to each file dict and returns the overview text.
+    """
+    chunk_tokens = chunk_tokens or SUMMARY_CHUNK_TOKENS
+    max_workers = max_workers or SUMMARY_CONCURRENCY
+    cache = load_file_summaries([f.get("sha") for f in file_summaries], cache_path)
+    files = [f for f in file_summaries if f.get("snippet")]
+    missing = [f for f in files if f.get("sha") not in cache]
+    if missing:
+        by_text = {}
+        for f in missing:
+            f = {**f, "snippet": truncate_to_tokens(f["snippet"], chunk_tokens // 2)}
+            by_text[f"FILE: {f['path']}\n```\n{f['snippet']}\n```"] = f
+        chunks = [[by_text[text] for text in chunk] for chunk in chunk_by_tokens(list(by_text), chunk_tokens)]
+        results = map_bounded(_summarize_files, chunks, max_workers=max_workers)
+        new = {}
+        for chunk, summaries in zip(chunks, results):
+            if isinstance(summaries, Exception):
+                continue
+            for f in chunk:
+                if f["path"] in summaries and f.get("sha"):
+                    new[f["sha"]] = summaries[f["path"]]
+        # Only the new summaries are written, not the whole cache
+        save_file_summaries(new, cache_path)
+        cache.update(new)
+    lines = []
+    for f in file_summaries:
+        summary = cache.get(f.get("sha"))
+        if summary:
+            f["summary"] = summary
+            lines.append(f"- {f['path']}: {summary}")
+    if not lines:
+        return ""
+    # Reduce hierarchically until everything fits in a single call
+    while len(lines) > 1:
+        chunks = chunk_by_tokens(lines, chunk_tokens)
+        results = map_bounded(_reduce_summaries, chunks, max_workers=max_workers)
+        reduced = [r for r in results if not isinstance(r, Exception) and r]
+        if not reduced or len(reduced) >= len(lines):
+            break
+        if len(chunks) == 1:
+            return reduced[0]
+        lines = reduced
+    return "\n".join(lines)
@@ -0,0 +1,277 @@
+import datetime
+import json
+import os
+import sqlite3
+import subprocess
+import threading
+from collections import Counter
+from github import GithubException
+from utils.rate_limit import GitHubBudgetExceeded
+from utils.repo_mirror import RepoMirror, find_mirror, run_git
+from utils.tracing import traced
+
+# One SQLite commit history per repo is kept here
+COMMIT_STORE_DIR = os.environ.get("COMMIT_STORE_DIR", os.path.join(".cache", "commits"))
+# Commits fetched on the first sync of a repo; later syncs only fetch commits newer than the stored head
+COMMIT_HISTORY_DEPTH = int(os.environ.get("COMMIT_HISTORY_DEPTH", "100"))
+# Commits whose additions/deletions/changed-file counts are fetched per GraphQL request
+COMMIT_STATS_BATCH_SIZE = int(os.environ.get("COMMIT_STATS_BATCH_SIZE", "50"))
+
+_lock = threading.Lock()
+_stores = {}
+
+class CommitStore:
+    """
+    Local commit history of one repo (<COMMIT_STORE_DIR>/<owner>__<name>.sqlite3), indexed by
+    SHA and date, with per-commit stats and changed paths where known. sync_commit_store() adds
+    what is new upstream; every query after that is local.
+    """
+    def __init__(self, repo_full_name, store_dir=None):
+        store_dir = store_dir or COMMIT_STORE_DIR
+        os.makedirs(store_dir, exist_ok=True)
+        self.repo_full_name = repo_full_name
+        self.path = os.path.join(store_dir, repo_full_name.replace("/", "__") + ".sqlite3")
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS commits (sha TEXT PRIMARY KEY, date TEXT, committed_at TEXT, "
+            "author TEXT, message TEXT, additions INTEGER, deletions INTEGER, changed_files INTEGER, "
+            "files_known INTEGER DEFAULT 0);"
+            "CREATE INDEX IF NOT EXISTS commits_date ON commits(date);"
+            "CREATE INDEX IF NOT EXISTS commits_committed_at ON commits(committed_at);"
+            "CREATE TABLE IF NOT EXISTS commit_files (sha TEXT, path TEXT, additions INTEGER, "
+            "deletions INTEGER, PRIMARY KEY (sha, path));"
+            "CREATE INDEX IF NOT EXISTS commit_files_path ON commit_files(path);"
+        )
+        self._db.commit()
+
+    def head(self):
+        """(sha, committed_at) of the newest stored commit, or (None, None) when empty."""
+        with self._lock:
+            row = self._db.execute("SELECT sha, committed_at FROM commits ORDER BY committed_at DESC LIMIT 1").fetchone()
+        return row or (None, None)
+
+    def known(self, shas):
+        with self._lock:
+            marks = ",".join("?" * len(shas))
+            return {row[0] for row in self._db.execute(f"SELECT sha FROM commits WHERE sha IN ({marks})", list(shas))}
+
+    def add(self, commits):
+        """Insert commits (dicts like commits() returns); rows already stored are kept as they are."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO commits (sha, date, committed_at, author, message, additions, deletions, "
+                "changed_files) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(c["sha"], c["date"], c.get("committed_at") or c["date"], c["author"], c["message"],
+                  c.get("additions"), c.get("deletions"), c.get("changed_files")) for c in commits]
+            )
+            self._db.commit()
+        for c in commits:
+            if "files" in c:
+                self.set_files(c["sha"], c["files"])
+
+    def set_stats(self, stats):
+        """stats: {sha: (additions, deletions, changed_files)}."""
+        with self._lock:
+            self._db.executemany(
+                "UPDATE commits SET additions = ?, deletions = ?, changed_files = ? WHERE sha = ?",
+                [(*values, sha) for sha, values in stats.items()]
+            )
+            self._db.commit()
+
+    def set_files(self, sha, files):
+        """files: [{"path", "additions", "deletions"}] changed by the commit."""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO commit_files (sha, path, additions, deletions) VALUES (?, ?, ?, ?)",
+                [(sha, f["path"], f.get("additions"), f.get("deletions")) for f in files]
+            )
+            self._db.execute("UPDATE commits SET files_known = 1 WHERE sha = ?", (sha,))
+            self._db.commit()
+
+    def missing_stats(self):
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT sha FROM commits WHERE additions IS NULL")]
+
+    def missing_files(self):
+        """(sha, committed_at) of commits whose changed paths are not stored yet, newest first."""
+        with self._lock:
+            return self._db.execute(
+                "SELECT sha, committed_at FROM commits WHERE files_known = 0 ORDER BY committed_at DESC").fetchall()
+
+    def commits(self, since=None, until=None, limit=None):
+        """
+        Stored commits with date in [since, until) (ISO strings, either may be None), newest first.
+        Each dict has sha, author, date, message, additions, deletions, changed_files, and
+        "files" (changed paths) when known.
+        """
+        query = ("SELECT c.sha, c.author, c.date, c.message, c.additions, c.deletions, c.changed_files, "
+                 "c.files_known, (SELECT json_group_array(path) FROM commit_files f WHERE f.sha = c.sha) "
+                 "FROM commits c WHERE (? IS NULL OR c.date >= ?) AND (? IS NULL OR c.date < ?) "
+                 "ORDER BY c.date DESC LIMIT ?")
+        since, until = _utc(since), _utc(until)
+        with self._lock:
+            rows = self._db.execute(query, (since, since, until, until, -1 if limit is None else limit)).fetchall()
+        history = []
+        for sha, author, date, message, additions, deletions, changed_files, files_known, files in rows:
+            commit = {"sha": sha, "author": author, "date": date, "message": message,
+                      "additions": additions, "deletions": deletions, "changed_files": changed_files}
+            if files_known:
+                commit["files"] = sorted(json.loads(files))
+            history.append(commit)
+        return history
+
+    def churn(self, since=None):
+        """{path: commits touching it} over the stored history (or since a date), from known file lists."""
+        since = _utc(since)
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT f.path, COUNT(*) FROM commit_files f JOIN commits c ON c.sha = f.sha "
+                "WHERE ? IS NULL OR c.date >= ? GROUP BY f.path", (since, since)
+            ).fetchall()
+        return Counter(dict(rows))
+
+def _utc(date):
+    # Stored dates are UTC isoformat(); normalize query bounds the same way so they compare as text
+    if not date:
+        return None
+    parsed = datetime.datetime.fromisoformat(date.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed.astimezone(datetime.timezone.utc).isoformat()
+
+def get_commit_store(repo_full_name):
+    """Memoized CommitStore for a repo."""
+    with _lock:
+        if repo_full_name not in _stores:
+            _stores[repo_full_name] = CommitStore(repo_full_name)
+        return _stores[repo_full_name]
+
+def _sync_mirror(mirror, store):
+    # Every commit's stats and paths come from one local `git log --numstat`
+    head_sha, _ = store.head()
+    args = ["log", "--numstat", "--format=%x1e%H%x00%an%x00%aI%x00%cI%x00%B%x1f"]
+    out = None
+    if head_sha:
+        # Exactly the commits reachable from HEAD but not from the stored head, whatever their dates
+        # (--since would miss older-dated commits brought in by a merge)
+        try:
+            out = run_git(args + [f"{head_sha}..HEAD"], cwd=mirror.path)
+        except subprocess.CalledProcessError:
+            # The stored head is gone from the mirror (history rewritten): start over from HEAD
+            pass
+    if out is None:
+        out = run_git(args + [f"-n{COMMIT_HISTORY_DEPTH}", "HEAD"], cwd=mirror.path)
+    out = out.decode(errors="replace")
+    commits = []
+    for record in out.split("\x1e")[1:]:
+        header, _, numstat = record.partition("\x1f")
+        sha, author, date, committed_at, message = header.split("\0", 4)
+        files = []
+        for line in numstat.strip("\n").splitlines():
+            added, deleted, path = line.split("\t", 2)
+            # Binary files show "-" for both counts
+            files.append({"path": path, "additions": int(added) if added.isdigit() else 0,
+                          "deletions": int(deleted) if deleted.isdigit() else 0})
+        commits.append({
+            "sha": sha, "author": author, "date": _utc(date), "committed_at": _utc(committed_at),
+            "message": message.strip(), "files": files,
+            "additions": sum(f["additions"] for f in files),
+            "deletions": sum(f["deletions"] for f in files),
+            "changed_files": len(files)
+        })
+    known = store.known([c["sha"] for c in commits]) if commits else set()
+    new = [c for c in commits if c["sha"] not in known]
+    store.add(new)
+    return len(new)
+
+def _fetch_stats(repo, store):
+    # Batched GraphQL: additions/deletions/changed files for COMMIT_STATS_BATCH_SIZE commits per request
+    owner, name = repo.full_name.split("/")
+    missing = store.missing_stats()
+    for start in range(0, len(missing), COMMIT_STATS_BATCH_SIZE):
+        batch = missing[start:start + COMMIT_STATS_BATCH_SIZE]
+        fields = " ".join(
+            f"c{i}: object(oid: {json.dumps(sha)}) {{ ... on Commit {{ additions deletions changedFilesIfAvailable }} }}"
+            for i, sha in enumerate(batch)
+        )
+        query = f"query($owner: String!, $name: String!) {{ repository(owner: $owner, name: $name) {{ {fields} }} }}"
+        try:
+            _, data = repo.requester.graphql_query(query, {"owner": owner, "name": name})
+            found = data["data"]["repository"]
+        except (GithubException, KeyError, TypeError):
+            continue
+        store.set_stats({
+            sha: (node["additions"], node["deletions"], node.get("changedFilesIfAvailable"))
+            for i, sha in enumerate(batch) if (node := found.get(f"c{i}"))
+        })
+
+def _fill_paths_from_mirror(repo_full_name, store):
+    # The REST API only lists a commit's files one commit per request, so changed paths come
+    # from one `git log --name-only` over the repo's local mirror, if there already is one
+    # (cloning is left to REPO_SOURCE=mirror); without it they stay unknown
+    missing = store.missing_files()
+    if not missing:
+        return
+    try:
+        mirror = find_mirror(repo_full_name)
+        if mirror is None:
+            return
+        # Only the missing commits the mirror has: unknown SHAs would make git log fail
+        checked = run_git(["cat-file", "--batch-check=%(objectname) %(objecttype)"], cwd=mirror.path,
+                          input="".join(f"{sha}\n" for sha, _ in missing).encode()).decode()
+        wanted = {line.split()[0] for line in checked.splitlines() if line.endswith(" commit")}
+        if not wanted:
+            return
+        out = run_git(["log", "--no-walk=unsorted", "--name-only", "--no-renames", "--format=%x1e%H", "--stdin"],
+                      cwd=mirror.path, input="".join(f"{sha}\n" for sha in wanted).encode()).decode(errors="replace")
+    except (subprocess.CalledProcessError, OSError):
+        # The paths are filled in by a later sync
+        return
+    for record in out.split("\x1e")[1:]:
+        sha, _, paths = record.partition("\n")
+        if sha in wanted:
+            store.set_files(sha, [{"path": path} for path in paths.split("\n") if path])
+
+def _sync_api(repo, store):
+    head_sha, head_at = store.head()
+    if head_at:
+        since = datetime.datetime.fromisoformat(head_at)
+        listing = repo.get_commits(since=since)
+    else:
+        listing = repo.get_commits()
+    new = []
+    for commit in listing:
+        # Newest first: since= is inclusive, so stop at the first commit already stored
+        if commit.sha == head_sha or (head_at and store.known([commit.sha])):
+            break
+        new.append({
+            "sha": commit.sha,
+            "author": commit.commit.author.name,
+            "date": _utc(commit.commit.author.date.isoformat()),
+            "committed_at": _utc(commit.commit.committer.date.isoformat()),
+            "message": commit.commit.message
+        })
+        if len(new) >= COMMIT_HISTORY_DEPTH:
+            break
+    store.add(new)
+    try:
+        _fetch_stats(repo, store)
+    except GitHubBudgetExceeded:
+        # Stats are an extra: the commits themselves are stored, the rest waits for the next sync
+        pass
+    _fill_paths_from_mirror(repo.full_name, store)
+    return len(new)
+
+@traced("github")
+def sync_commit_store(repo):
+    """
+    Bring a repo's CommitStore up to date from repo (a PyGithub handle or a RepoMirror),
+    requesting only commits newer than the stored head. Returns (store, number of new commits).
+    """
+    store = get_commit_store(repo.full_name)
+    if isinstance(repo, RepoMirror):
+        added = _sync_mirror(repo, store)
+    else:
+        added = _sync_api(repo, store)
+    return store, added
@@ -0,0 +1,139 @@
+import datetime
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+
+# SQLite full-text index of generated drafts (contents/*.md) and where each came from
+DRAFT_LIBRARY_PATH = os.environ.get("DRAFT_LIBRARY_PATH", os.path.join(".cache", "drafts.sqlite3"))
+
+_lock = threading.Lock()
+_db = None
+
+def _connect():
+    global _db
+    if _db is None:
+        os.makedirs(os.path.dirname(DRAFT_LIBRARY_PATH) or ".", exist_ok=True)
+        _db = sqlite3.connect(DRAFT_LIBRARY_PATH, check_same_thread=False)
+        _db.executescript(
+            "CREATE TABLE IF NOT EXISTS drafts (id INTEGER PRIMARY KEY, path TEXT UNIQUE, title TEXT, repo TEXT, "
+            "run_id TEXT, branch TEXT, created_at TEXT, content_hash TEXT, mtime_ns INTEGER, size INTEGER);"
+            "CREATE INDEX IF NOT EXISTS drafts_created_at ON drafts(created_at);"
+            # Full-text rows share their rowid with the draft's id
+            "CREATE VIRTUAL TABLE IF NOT EXISTS drafts_fts USING fts5("
+            "title, repo, content, tokenize = 'porter unicode61');"
+        )
+        _db.commit()
+    return _db
+
+def draft_title(path, content):
+    """The draft's first markdown heading, or its file name."""
+    match = re.search(r"^#+\s+(.+)$", content, re.MULTILINE)
+    return match.group(1).strip() if match else os.path.splitext(os.path.basename(path))[0]
+
+def _timestamp(mtime_ns):
+    # Drafts found on disk (older runs, hand-written posts) are dated by their modification time
+    moment = datetime.datetime.fromtimestamp(mtime_ns / 1e9) if mtime_ns else datetime.datetime.now()
+    return moment.isoformat(timespec="seconds")
+
+def _index(db, path, content, repo, run_id, branch):
+    if content is None:
+        with open(path, "r", encoding="utf-8", errors="ignore") as f:
+            content = f.read()
+    content_hash = hashlib.sha256(content.encode()).hexdigest()
+    try:
+        stat = os.stat(path)
+        mtime_ns, size = stat.st_mtime_ns, stat.st_size
+    except OSError:
+        mtime_ns, size = None, len(content.encode())
+    title = draft_title(path, content)
+    row = db.execute("SELECT id, repo, run_id, branch, created_at, content_hash FROM drafts WHERE path = ?", (path,)).fetchone()
+    draft_id, old_repo, old_run_id, old_branch, created_at, old_hash = row or (None, None, None, None, None, None)
+    values = (title, repo or old_repo, run_id or old_run_id, branch or old_branch,
+              created_at or _timestamp(mtime_ns), content_hash, mtime_ns, size)
+    if draft_id is None:
+        draft_id = db.execute(
+            "INSERT INTO drafts (title, repo, run_id, branch, created_at, content_hash, mtime_ns, size, path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", values + (path,)).lastrowid
+    else:
+        db.execute("UPDATE drafts SET title = ?, repo = ?, run_id = ?, branch = ?, created_at = ?, content_hash = ?, "
+                   "mtime_ns = ?, size = ? WHERE id = ?", values + (draft_id,))
+    if content_hash != old_hash or (repo and repo != old_repo):
+        db.execute("DELETE FROM drafts_fts WHERE rowid = ?", (draft_id,))
+        db.execute("INSERT INTO drafts_fts (rowid, title, repo, content) VALUES (?, ?, ?, ?)",
+                   (draft_id, title, repo or old_repo or "", content))
+
+def record_draft(path, content=None, repo=None, run_id=None, branch=None):
+    """
+    Index the draft at path (read from disk unless content is given). Provenance fields left as
+    None keep what is already recorded, so a re-index after an edit doesn't forget the repo or run.
+    The text is only re-indexed when its hash (or the repo) changed.
+    """
+    with _lock:
+        db = _connect()
+        _index(db, path, content, repo, run_id, branch)
+        db.commit()
+
+def set_draft_branch(path, branch):
+    """Record the PR branch a draft was committed or published to."""
+    with _lock:
+        db = _connect()
+        db.execute("UPDATE drafts SET branch = ? WHERE path = ?", (branch, path))
+        db.commit()
+
+def sync_library(contents_dir="contents"):
+    """
+    Bring the index in line with contents_dir: index new or changed files (by mtime and size, so
+    unchanged drafts are not re-read) and forget deleted ones. Cheap enough to run before every search.
+    """
+    on_disk = {}
+    if os.path.isdir(contents_dir):
+        for entry in os.scandir(contents_dir):
+            if entry.is_file() and entry.name.endswith(".md"):
+                stat = entry.stat()
+                on_disk[os.path.join(contents_dir, entry.name)] = (stat.st_mtime_ns, stat.st_size)
+    with _lock:
+        db = _connect()
+        prefix = os.path.join(contents_dir, "")
+        indexed = {path: (draft_id, mtime_ns, size) for draft_id, path, mtime_ns, size in db.execute(
+            "SELECT id, path, mtime_ns, size FROM drafts WHERE substr(path, 1, ?) = ?", (len(prefix), prefix))}
+        for path, (draft_id, _, _) in indexed.items():
+            if path not in on_disk:
+                db.execute("DELETE FROM drafts WHERE id = ?", (draft_id,))
+                db.execute("DELETE FROM drafts_fts WHERE rowid = ?", (draft_id,))
+        # One transaction for the whole pass, so the first sync of thousands of drafts is quick
+        for path, stat in on_disk.items():
+            if indexed.get(path, (None,))[1:] != stat:
+                _index(db, path, None, None, None, None)
+        db.commit()
+
+def _match_query(query):
+    # Every word must match (the last one as a prefix, for search-as-you-type); quoting keeps
+    # FTS5 operators and punctuation in user input from being parsed as query syntax
+    words = re.findall(r"\w+", query)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+def search_drafts(query="", limit=20):
+    """
+    Drafts matching query (title and repo weigh more than body text), best first; the most
+    recent drafts when query is empty. Each result has path, title, repo, run_id, branch,
+    created_at and, for searches, a snippet of the matching text.
+    """
+    match = _match_query(query)
+    with _lock:
+        db = _connect()
+        if match is None:
+            rows = db.execute(
+                "SELECT path, title, repo, run_id, branch, created_at, '' FROM drafts "
+                "ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        else:
+            rows = db.execute(
+                "SELECT d.path, d.title, d.repo, d.run_id, d.branch, d.created_at, "
+                "snippet(drafts_fts, 2, '[', ']', '...', 12) FROM drafts_fts "
+                "JOIN drafts d ON d.id = drafts_fts.rowid WHERE drafts_fts MATCH ? "
+                "ORDER BY bm25(drafts_fts, 10.0, 5.0, 1.0) LIMIT ?", (match, limit)).fetchall()
+    keys = ("path", "title", "repo", "run_id", "branch", "created_at", "snippet")
+    return [dict(zip(keys, row)) for row in rows]
@@ -1,47 +1,108 @@
+import hashlib
+import json
 import os
-from github import Github
-import glob
+import threading
+from utils.github_client import get_repo
+from github import GithubException, UnknownObjectException
+from utils.draft_library import sync_library, search_drafts
 
-def get_github_client():
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        raise Exception("Please set the GITHUB_TOKEN environment variable.")
-    return Github(token)
+# Blob SHA each file had after our last commit or publish, keyed by "<repo>@<branch>:<path>",
+# so edit-commit never has to fetch it from GitHub before updating the file
+BLOB_SHA_CACHE_PATH = os.environ.get("BLOB_SHA_CACHE_PATH", os.path.join(".cache", "blob_shas.json"))
+
+_lock = threading.Lock()
+
+def git_blob_sha(data):
+    """The SHA git (and GitHub) gives a blob with this content."""
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def _cache_key(repo_name, branch, path):
+    return f"{repo_name}@{branch}:{path}"
+
+def _load_blob_shas():
+    try:
+        with open(BLOB_SHA_CACHE_PATH, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def remember_blob_shas(repo_name, branch, shas):
+    """Record {repo path: blob sha} as the current content of those files on branch."""
+    with _lock:
+        cache = _load_blob_shas()
+        cache.update({_cache_key(repo_name, branch, path): sha for path, sha in shas.items()})
+        os.makedirs(os.path.dirname(BLOB_SHA_CACHE_PATH) or ".", exist_ok=True)
+        tmp_path = BLOB_SHA_CACHE_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, BLOB_SHA_CACHE_PATH)
+
+def _remote_blob_sha(repo, repo_path, branch):
+    try:
+        return repo.get_contents(repo_path, ref=branch).sha
+    except UnknownObjectException:
+        return None
+
+def commit_file(repo, local_path, repo_path, branch, message):
+    """
+    Commit local_path to repo_path on branch, unless its content matches the blob we last
+    committed there. The blob SHA comes from the local cache (falling back to one lookup the
+    first time), so each real change costs a single request.
+    Returns the new blob SHA, or None if nothing changed.
+    """
+    with open(local_path, "rb") as f:
+        data = f.read()
+    new_sha = git_blob_sha(data)
+    known_sha = _load_blob_shas().get(_cache_key(repo.full_name, branch, repo_path))
+    if known_sha is None:
+        known_sha = _remote_blob_sha(repo, repo_path, branch)
+    if known_sha == new_sha:
+        remember_blob_shas(repo.full_name, branch, {repo_path: new_sha})
+        return None
+    try:
+        result = _put_file(repo, repo_path, branch, message, data, known_sha)
+    except GithubException as e:
+        if e.status not in (409, 422):
+            raise
+        # The file changed on GitHub since our last commit: take its current SHA and retry once
+        result = _put_file(repo, repo_path, branch, message, data, _remote_blob_sha(repo, repo_path, branch))
+    sha = result["content"].sha
+    remember_blob_shas(repo.full_name, branch, {repo_path: sha})
+    return sha
+
+def _put_file(repo, repo_path, branch, message, data, sha):
+    if sha is None:
+        return repo.create_file(repo_path, message, data, branch=branch)
+    return repo.update_file(repo_path, message, data, sha, branch=branch)
 
 def pick_markdown_file():
-    files = glob.glob("contents/*.md")
-    if not files:
-        print("No markdown files found in contents/.")
+    sync_library("contents")
+    query = input("Search drafts (blank for the most recent): ").strip()
+    drafts = search_drafts(query)
+    if not drafts:
+        print("No matching markdown files found in contents/.")
         exit(1)
-    print("Available markdown files:")
-    for i, f in enumerate(files):
-        print(f"{i+1}. {f}")
+    print("Matching drafts:")
+    for i, draft in enumerate(drafts):
+        print(f"{i+1}. {draft['title']} ({draft['repo'] or '-'}, {(draft['created_at'] or '')[:10]}) {draft['path']}")
     idx = int(input("Select file to edit/commit (number): ")) - 1
-    return files[idx]
+    return drafts[idx]["path"]
 
 def main():
-    g = get_github_client()
     repo_name = input("GitHub repo (e.g. harish876/harish876.github.io): ").strip()
-    repo = g.get_repo(repo_name)
+    repo = get_repo(repo_name)
     branch = input("Branch name to commit to (e.g. blog-title-20240703...-auto): ").strip()
     file_path = pick_markdown_file()
     print(f"You can now edit {file_path} in your editor. Press Enter when done.")
     input()
-    with open(file_path, "r", encoding="utf-8") as f:
-        content = f.read()
     github_path = "content/posts/" + os.path.basename(file_path)  # adjust as needed
-    # Get file SHA on branch
-    contents = repo.get_contents(github_path, ref=branch)
-    sha = contents.sha
     commit_msg = input("Commit message: ").strip()
-    repo.update_file(
-        path=github_path,
-        message=commit_msg,
-        content=content,
-        sha=sha,
-        branch=branch
-    )
-    print(f"Committed {file_path} to branch {branch} in {repo_name}.")
+    if commit_file(repo, file_path, github_path, branch, commit_msg):
+        print(f"Committed {file_path} to branch {branch} in {repo_name}.")
+    else:
+        print(f"{file_path} is unchanged on {branch}; nothing to commit.")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
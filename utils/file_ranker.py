@@ -0,0 +1,58 @@
+import math
+import os
+
+# File stems that usually hold a project's entry point or public surface
+ENTRY_POINT_STEMS = {"main", "__main__", "app", "cli", "index", "server", "lib", "mod", "core", "api"}
+# Build and dependency manifests: small, and they say what the project is built on
+MANIFEST_NAMES = {
+    "pyproject.toml", "setup.py", "setup.cfg", "requirements.txt", "package.json", "cargo.toml",
+    "go.mod", "gemfile", "pom.xml", "build.gradle", "cmakelists.txt", "makefile", "dockerfile"
+}
+SOURCE_EXTENSIONS = {
+    ".py", ".js", ".ts", ".tsx", ".jsx", ".go", ".rs", ".java", ".kt", ".c", ".cc", ".cpp", ".h",
+    ".hpp", ".cs", ".rb", ".php", ".swift", ".scala", ".ex", ".zig", ".lua", ".sh", ".sql"
+}
+CONFIG_EXTENSIONS = {".md", ".rst", ".toml", ".yaml", ".yml", ".json", ".cfg", ".ini"}
+# Assets, archives and generated files: never worth a download for a snippet
+SKIP_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".ico", ".svg", ".pdf", ".zip", ".gz", ".tar", ".jar", ".whl",
+    ".so", ".dll", ".exe", ".bin", ".woff", ".woff2", ".ttf", ".mp4", ".mp3", ".lock", ".map",
+    ".snap", ".pyc", ".ipynb", ".csv", ".parquet"
+}
+SKIP_SUFFIXES = (".min.js", ".min.css", "-lock.json", ".pb.go", "_pb2.py")
+CORE_DIRS = {"src", "lib", "pkg", "cmd", "app", "internal", "core"}
+LOW_VALUE_DIRS = {
+    "test", "tests", "__tests__", "spec", "testdata", "fixtures", "vendor", "third_party",
+    "node_modules", "dist", "build", "examples", "example", "docs", "doc", ".github", "migrations"
+}
+
+def score_file(path, size, churn=0):
+    """
+    How useful a file's snippet is likely to be for describing the repo, from metadata alone:
+    entry points, manifests and core source dirs rank up; tests, vendored, generated and binary
+    files rank down; tiny or huge files lose a little; frequently changed files gain.
+    """
+    name = os.path.basename(path).lower()
+    stem, extension = os.path.splitext(name)
+    dirs = [part.lower() for part in path.split("/")[:-1]]
+    if extension in SKIP_EXTENSIONS or name.endswith(SKIP_SUFFIXES) or not size:
+        return -10.0
+    score = 0.0
+    if extension in SOURCE_EXTENSIONS:
+        score += 3
+    elif extension in CONFIG_EXTENSIONS:
+        score += 1
+    if name in MANIFEST_NAMES:
+        score += 4 if len(dirs) <= 1 else 1
+    if stem in ENTRY_POINT_STEMS:
+        score += 3
+    if dirs and dirs[0] in CORE_DIRS:
+        score += 2
+    if any(part in LOW_VALUE_DIRS for part in dirs):
+        score -= 4
+    score -= 0.25 * len(dirs)
+    if size < 200:
+        score -= 1
+    elif size > 200_000:
+        score -= 3
+    return score + min(math.log2(1 + churn) * 1.5, 5)
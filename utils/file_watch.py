@@ -0,0 +1,93 @@
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import time
+
+# Seconds a file must stay quiet after a save before it is reported (editors often write several times)
+WATCH_DEBOUNCE = float(os.environ.get("WATCH_DEBOUNCE", "1.5"))
+# How often the polling fallback rescans the directory when inotify is unavailable
+WATCH_POLL_INTERVAL = float(os.environ.get("WATCH_POLL_INTERVAL", "0.5"))
+
+# inotify(7) event flags: a write finished, or a file was renamed into the directory (atomic saves)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+_EVENT_HEADER = struct.Struct("iIII")
+
+class _InotifySource:
+    """Changed file names in a directory, from Linux inotify (via libc, no extra dependency)."""
+    def __init__(self, directory):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"cannot watch {directory}")
+
+    def wait(self, timeout):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        data = os.read(self.fd, 64 * 1024)
+        names, offset = set(), 0
+        while offset < len(data):
+            _, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            names.add(data[offset:offset + length].rstrip(b"\0").decode(errors="replace"))
+            offset += length
+        return names
+
+    def close(self):
+        os.close(self.fd)
+
+class _PollingSource:
+    """Fallback for platforms without inotify: rescans mtimes and sizes every WATCH_POLL_INTERVAL."""
+    def __init__(self, directory):
+        self.directory = directory
+        self.seen = self._scan()
+
+    def _scan(self):
+        entries = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file():
+                stat = entry.stat()
+                entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        return entries
+
+    def wait(self, timeout):
+        time.sleep(WATCH_POLL_INTERVAL if timeout is None else min(timeout, WATCH_POLL_INTERVAL))
+        current = self._scan()
+        changed = {name for name, stat in current.items() if self.seen.get(name) != stat}
+        self.seen = current
+        return changed
+
+    def close(self):
+        pass
+
+def watch_changes(directory, pattern="*.md", debounce=None):
+    """
+    Yield sets of paths in directory (matching pattern) that were saved, each batch only once no
+    matching file has changed for debounce seconds, so a burst of saves becomes one batch.
+    Uses inotify where available, polling otherwise. Runs until the caller stops iterating.
+    """
+    debounce = WATCH_DEBOUNCE if debounce is None else debounce
+    try:
+        source = _InotifySource(directory)
+    except (OSError, AttributeError):
+        source = _PollingSource(directory)
+    pending, deadline = set(), None
+    try:
+        while True:
+            timeout = max(deadline - time.monotonic(), 0) if pending else None
+            names = {name for name in source.wait(timeout) if fnmatch.fnmatch(name, pattern)}
+            if names:
+                pending |= {os.path.join(directory, name) for name in names}
+                deadline = time.monotonic() + debounce
+            elif pending and time.monotonic() >= deadline:
+                yield pending
+                pending, deadline = set(), None
+    finally:
+        source.close()
@@ -0,0 +1,145 @@
+from github import Github
+from github.Requester import Requester, HTTPSRequestsConnectionClass
+from utils.http_cache import HTTPCache, CachingAdapter, CACHE_STATUS_HEADER
+from utils.rate_limit import RateLimitScheduler
+from utils.tracing import span, tracer
+import os
+import threading
+import requests
+
+# REST API root; point it at a GitHub Enterprise host or a local stand-in (see benchmarks/)
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com")
+# On-disk cache for GitHub API reads, revalidated with ETag / Last-Modified
+CACHE_DIR = os.environ.get("GITHUB_CACHE_DIR", os.path.join(".cache", "github"))
+CACHE_MAX_BYTES = int(os.environ.get("GITHUB_CACHE_MAX_MB", "200")) * 1024 * 1024
+# Max keep-alive connections kept open to api.github.com; keep it >= GITHUB_FETCH_CONCURRENCY
+POOL_SIZE = int(os.environ.get("GITHUB_POOL_SIZE", "16"))
+# Process-wide cap on GitHub requests in flight, shared by every node and batch job
+GITHUB_MAX_CONCURRENCY = int(os.environ.get("GITHUB_MAX_CONCURRENCY", "16"))
+
+_lock = threading.RLock()
+_cache = None
+_session = None
+_client = None
+_repos = {}
+_repo_locks = {}
+_request_slots = threading.BoundedSemaphore(GITHUB_MAX_CONCURRENCY)
+_scheduler = RateLimitScheduler()
+
+def get_http_cache():
+    global _cache
+    with _lock:
+        if _cache is None:
+            _cache = HTTPCache(CACHE_DIR, CACHE_MAX_BYTES)
+        return _cache
+
+def get_cache_stats():
+    """Hit/miss counters of the GitHub HTTP cache for this process."""
+    return dict(get_http_cache().stats)
+
+def get_session(retry=None, pool_size=None):
+    """
+    The process-wide requests session every GitHub call goes through.
+    It has one pooled CachingAdapter, so keep-alive and TLS sessions are reused across the whole pipeline.
+    """
+    global _session
+    with _lock:
+        if _session is None:
+            pool_size = pool_size or POOL_SIZE
+            adapter = CachingAdapter(
+                get_http_cache(),
+                max_retries=retry if retry is not None else requests.adapters.DEFAULT_RETRIES,
+                pool_connections=pool_size,
+                pool_maxsize=pool_size
+            )
+            _session = requests.Session()
+            _session.auth = Requester.noopAuth
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+def get_rate_limit_stats():
+    """Requests sent, retries, time spent waiting on rate limits, and the last known quota per resource."""
+    return _scheduler.snapshot()
+
+def get_connection_stats():
+    """How many HTTP connections the shared pool opened, and how many requests reused one."""
+    if _session is None:
+        return {"requests": 0, "opened": 0, "reused": 0}
+    adapter = _session.get_adapter("https://")
+    pools = [adapter.poolmanager.pools[key] for key in adapter.poolmanager.pools.keys()]
+    requests_made = sum(p.num_requests for p in pools)
+    opened = sum(p.num_connections for p in pools)
+    return {"requests": requests_made, "opened": opened, "reused": max(requests_made - opened, 0)}
+
+class PooledHTTPSConnectionClass(HTTPSRequestsConnectionClass):
+    """PyGithub connection that sends requests through the shared session instead of opening its own."""
+    protocol = "https"
+    default_port = 443
+
+    def __init__(self, host, port=None, strict=False, timeout=None, retry=None, pool_size=None, **kwargs):
+        self.port = port if port else self.default_port
+        self.host = host
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.retry = retry
+        self.pool_size = pool_size
+        self.session = get_session(retry, pool_size)
+
+    def getresponse(self):
+        resource = "graphql" if self.url.rstrip("/").endswith("/graphql") else "core"
+        write = self.verb != "GET" and resource != "graphql"
+        # Only GraphQL queries are sent, never mutations, so those are safe to repeat
+        idempotent = self.verb in ("GET", "HEAD", "PUT", "DELETE") or resource == "graphql"
+        with span(f"{self.verb} {self.url.split('?')[0]}", "github") as args:
+            # Pacing, retries and per-node budgets happen in the scheduler; a request only
+            # holds a concurrency slot while it is actually on the wire
+            response = _scheduler.send(resource, self._send_once, write, idempotent)
+            cached = response.headers.get(CACHE_STATUS_HEADER) == "revalidated"
+            remaining = response.headers.get("X-RateLimit-Remaining")
+            args.update(status=response.status, cached=cached, rate_limit_remaining=remaining)
+            tracer.count(github_requests=1, github_cache_hits=int(cached))
+            if remaining is not None:
+                # Header values are strings, so count() keeps the latest instead of summing
+                tracer.count(rate_limit_remaining=remaining)
+            return response
+
+    def _send_once(self):
+        with _request_slots:
+            return super().getresponse()
+
+    def close(self):
+        # The session and its connection pool outlive any single PyGithub connection
+        pass
+
+class PooledHTTPConnectionClass(PooledHTTPSConnectionClass):
+    """Plain-HTTP variant, used when GITHUB_API_URL points at a local server."""
+    protocol = "http"
+    default_port = 80
+
+def get_github_client():
+    """The process-wide Github client, created on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            token = os.environ.get("GITHUB_TOKEN")
+            if not token:
+                raise Exception("Please set the GITHUB_TOKEN environment variable.")
+            Requester.injectConnectionClasses(PooledHTTPConnectionClass, PooledHTTPSConnectionClass)
+            # Retries and pacing are left to the RateLimitScheduler instead of PyGithub's
+            # fixed gaps between requests (which also hold back GraphQL reads) and its own retry loop
+            _client = Github(token, base_url=GITHUB_API_URL, pool_size=POOL_SIZE, retry=None,
+                             seconds_between_requests=None, seconds_between_writes=None)
+        return _client
+
+def get_repo(repo_full_name):
+    """Memoized repository handle, so each repo is looked up once per process."""
+    client = get_github_client()
+    with _lock:
+        repo_lock = _repo_locks.setdefault(repo_full_name, threading.Lock())
+    # Not under _lock: the lookup is a request, and opening a PyGithub connection
+    # takes _lock (get_session) while holding PyGithub's own connection lock
+    with repo_lock:
+        if repo_full_name not in _repos:
+            _repos[repo_full_name] = client.get_repo(repo_full_name)
+        return _repos[repo_full_name]
@@ -1,88 +1,285 @@
-from github import Github
+from utils.github_client import get_repo
+from utils.rate_limit import GitHubBudgetExceeded
+from utils.repo_mirror import RepoMirror, get_mirror, REPO_SOURCE
+from github import GithubException, UnknownObjectException
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from utils.tracing import traced, in_current_context
+from utils.file_ranker import score_file
+from utils.http_cache import CACHE_STATUS_HEADER
+from utils.commit_store import sync_commit_store
+import base64
+import heapq
 import os
 
-def get_github_client():
-    token = os.environ.get("GITHUB_TOKEN")
-    if not token:
-        raise Exception("Please set the GITHUB_TOKEN environment variable.")
-    return Github(token)
-
-def get_commit_history(repo_full_name):
-    g = get_github_client()
-    repo = g.get_repo(repo_full_name)
-    commits = repo.get_commits()
-    history = []
-    for commit in commits[:20]:  # Limit to latest 20 for brevity
-        history.append({
-            "sha": commit.sha,
-            "author": commit.commit.author.name,
-            "date": commit.commit.author.date.isoformat(),
-            "message": commit.commit.message
-        })
-    return history
-
-def get_readme_and_key_files(repo_full_name):
-    g = get_github_client()
-    repo = g.get_repo(repo_full_name)
-    # Get README
-    try:
-        readme_content = repo.get_readme().decoded_content.decode()
-    except Exception:
-        readme_content = ""
-    # Get key files (top-level, non-hidden, non-dir, not README)
-    contents = repo.get_contents("")
+# Max number of blob downloads in flight at once
+FETCH_CONCURRENCY = int(os.environ.get("GITHUB_FETCH_CONCURRENCY", "8"))
+# Bytes fetched from the start of each summarized file (a ranged request for bigger files)
+ANALYSIS_SNIPPET_BYTES = int(os.environ.get("ANALYSIS_SNIPPET_BYTES", "4096"))
+# Cap on file content downloaded per codebase analysis; lower-ranked files are skipped past it
+ANALYSIS_MAX_BYTES = int(os.environ.get("ANALYSIS_MAX_KB", "512")) * 1024
+# Key file snippets are 500 characters, so 2000 bytes covers them even in 4-byte UTF-8
+KEY_FILE_SNIPPET_BYTES = 2000
+
+def open_repo(repo_full_name):
+    """The repo to read from: a PyGithub handle, or a local RepoMirror when REPO_SOURCE=mirror."""
+    if REPO_SOURCE == "mirror":
+        return get_mirror(repo_full_name)
+    return get_repo(repo_full_name)
+
+@traced("github")
+def get_commit_history(repo_full_name, limit=20):
+    """
+    Latest commits, newest first, with stats and changed paths where known. The repo's local
+    commit store is synced first (only commits newer than its head are requested); older history
+    and range queries are then available from get_commit_store(repo_full_name) with no API calls.
+    """
+    store, _ = sync_commit_store(open_repo(repo_full_name))
+    return store.commits(limit=limit)
+
+@traced("github")
+def get_readme_and_key_files(repo_full_name, max_workers=None):
+    repo = open_repo(repo_full_name)
+    if isinstance(repo, RepoMirror):
+        readme_content = repo.readme()
+        top_files = list(repo.iter_files(recursive=False))
+    else:
+        # Get README
+        try:
+            readme_content = repo.get_readme().decoded_content.decode()
+        except UnknownObjectException:
+            readme_content = ""
+        top_files = [(c.name, c.size, c.sha) for c in repo.get_contents("") if c.type == "file"]
+    # Get key files (top-level, non-hidden, non-dir, not README, not binary), best-ranked first,
+    # and only the head of each since just the first 500 characters are kept
+    top_files = [FileRecord(name, size, sha) for name, size, sha in top_files if not name.lower().startswith("readme")]
+    top_files = sorted((f for f in top_files if score_file(f.path, f.size) > 0), key=lambda f: -score_file(f.path, f.size))
     key_files = []
-    for content_file in contents:
-        if content_file.type == "file" and not content_file.name.lower().startswith("readme"):
-            snippet = content_file.decoded_content.decode(errors='ignore')[:500]
+    heads = fetch_blob_heads(repo, top_files, KEY_FILE_SNIPPET_BYTES, max_workers=max_workers)
+    try:
+        for f, (text, _) in zip(top_files, heads):
             key_files.append({
-                "name": content_file.name,
-                "snippet": snippet
+                "name": f.path,
+                "snippet": text[:500]
             })
+    except GitHubBudgetExceeded:
+        # Key files are optional context: keep the ones fetched so far
+        pass
     return readme_content, key_files
 
-def analyze_codebase(repo_full_name, max_files=50, snippet_lines=20):
+class FileRecord:
+    """Metadata of one file in a repo listing. Slotted: big repos stream tens of thousands of these."""
+    __slots__ = ("path", "size", "sha", "extension")
+
+    def __init__(self, path, size, sha):
+        self.path = path
+        self.size = size or 0
+        self.sha = sha
+        self.extension = os.path.splitext(path)[-1].lower()
+
+    def as_dict(self):
+        return {"path": self.path, "size": self.size, "sha": self.sha, "extension": self.extension}
+
+def _walk_contents(repo, path=""):
+    # Fallback for trees GitHub truncates: one listing per directory, still no blob downloads
+    try:
+        contents = repo.get_contents(path)
+    except UnknownObjectException:
+        return
+    for content in contents:
+        if content.type == "dir":
+            yield from _walk_contents(repo, content.path)
+        elif content.type == "file":
+            yield FileRecord(content.path, content.size, content.sha)
+
+def iter_repo_files(repo):
     """
-    Recursively walk the repo, extract file metadata, code snippets, and basic insights.
-    Returns a dict with largest files, most common extensions, and file summaries.
+    Stream a FileRecord (path, size, sha, extension) for every file in the repo, from a single
+    recursive git tree request (or the local mirror). No blob content is fetched.
     """
-    g = get_github_client()
-    repo = g.get_repo(repo_full_name)
-    all_files = []
-    def walk(path=""):
-        try:
-            contents = repo.get_contents(path)
-        except Exception:
-            return
-        for content in contents:
-            if content.type == "dir":
-                walk(content.path)
-            elif content.type == "file":
-                try:
-                    raw = content.decoded_content.decode(errors='ignore')
-                except Exception:
-                    raw = ""
-                snippet = "\n".join(raw.splitlines()[:snippet_lines])
-                all_files.append({
-                    "path": content.path,
-                    "size": content.size,
-                    "lines": len(raw.splitlines()),
-                    "snippet": snippet,
-                    "extension": os.path.splitext(content.name)[-1].lower()
-                })
-    walk()
-    # Largest files
-    largest = sorted(all_files, key=lambda x: -x["size"])[:5]
-    # Most lines
-    most_lines = sorted(all_files, key=lambda x: -x["lines"])[:5]
-    # Most common extensions
-    from collections import Counter
-    ext_counter = Counter(f["extension"] for f in all_files)
-    most_common_ext = ext_counter.most_common(5)
+    if isinstance(repo, RepoMirror):
+        for path, size, sha in repo.iter_files():
+            yield FileRecord(path, size, sha)
+        return
+    try:
+        tree = repo.get_git_tree(repo.default_branch, recursive=True)
+    except GithubException:
+        # e.g. 409 for an empty repo; rate limits and budgets (not GithubException) still propagate
+        yield from _walk_contents(repo)
+        return
+    if tree.truncated:
+        yield from _walk_contents(repo)
+        return
+    for el in tree.tree:
+        if el.type == "blob":
+            yield FileRecord(el.path, el.size, el.sha)
+
+def fetch_blob_text(repo, sha):
+    """Download a single blob by SHA and decode it as text ("" if the blob no longer exists)."""
+    try:
+        blob = repo.get_git_blob(sha)
+    except UnknownObjectException:
+        return ""
+    if blob.encoding == "base64":
+        return base64.b64decode(blob.content).decode(errors='ignore')
+    return blob.content or ""
+
+def fetch_blob_head(repo, record, max_bytes):
+    """
+    The first max_bytes of a file as text, plus the bytes actually transferred. Files that fit
+    are fetched whole (raw, so the response is cacheable); bigger ones with a Range request.
+    """
+    if isinstance(repo, RepoMirror):
+        data = repo.read_blob(record.sha)[:max_bytes]
+        return data.decode(errors="ignore"), len(data)
+    headers = {"Accept": "application/vnd.github.raw"}
+    if record.size > max_bytes:
+        headers["Range"] = f"bytes=0-{max_bytes - 1}"
+    status, response_headers, body = repo.requester.requestJson("GET", f"{repo.url}/git/blobs/{record.sha}", headers=headers)
+    if status == 404:
+        return "", 0
+    if status >= 400:
+        raise GithubException(status, body, response_headers)
+    # A revalidated cache hit transferred no body. Otherwise the body arrives already decoded, so the
+    # transfer size comes from the headers; only a chunked response without Content-Length falls back to the text
+    length = response_headers.get("content-length")
+    if response_headers.get(CACHE_STATUS_HEADER.lower()):
+        received = 0
+    else:
+        received = int(length) if length and length.isdigit() else len(body.encode())
+    # A server that ignores Range sends the whole blob; only the head is kept either way
+    # (a character is never shorter than a byte, so this never cuts a ranged response)
+    return body[:max_bytes], received
+
+def _ordered_map(fn, items, max_workers=None):
+    # fn over items on a bounded pool, yielding results in input order; at most twice
+    # max_workers results are in flight or waiting to be consumed, so memory stays bounded
+    max_workers = max_workers or FETCH_CONCURRENCY
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        window = deque()
+        for item in items:
+            window.append(pool.submit(in_current_context(fn), item))
+            if len(window) >= 2 * max_workers:
+                yield window.popleft().result()
+        while window:
+            yield window.popleft().result()
+
+def fetch_blob_texts(repo, shas, max_workers=None):
+    """
+    Download blobs on a bounded thread pool of max_workers (default FETCH_CONCURRENCY).
+    Yields decoded texts in the same order as shas, streaming each one as soon as it and
+    every blob before it have arrived, so results are deterministic between runs.
+    A RepoMirror reads them from disk in order instead.
+    """
+    if isinstance(repo, RepoMirror):
+        for sha in shas:
+            yield repo.read_blob(sha).decode(errors="ignore")
+        return
+    yield from _ordered_map(lambda sha: fetch_blob_text(repo, sha), shas, max_workers)
+
+def fetch_blob_heads(repo, records, max_bytes, max_workers=None):
+    """Like fetch_blob_texts, but only the first max_bytes of each file: yields (text, bytes transferred)."""
+    if isinstance(repo, RepoMirror):
+        for record in records:
+            yield fetch_blob_head(repo, record, max_bytes)
+        return
+    yield from _ordered_map(lambda record: fetch_blob_head(repo, record, max_bytes), records, max_workers)
+
+def _push_top(heap, k, key, item):
+    # Bounded min-heap keeping the k items with the largest keys
+    if len(heap) < k:
+        heapq.heappush(heap, (key, item))
+    elif key > heap[0][0]:
+        heapq.heapreplace(heap, (key, item))
+
+def _top(heap):
+    return [item for _, item in sorted(heap, key=lambda entry: entry[0], reverse=True)]
+
+def _head_lines(text, snippet_lines):
+    """The first snippet_lines lines of text, without splitting the whole text."""
+    end = -1
+    for _ in range(snippet_lines):
+        end = text.find("\n", end + 1)
+        if end == -1:
+            break
+    return (text if end == -1 else text[:end]).rstrip("\n")
+
+def _line_estimate(text, size, head_bytes):
+    # Exact when the whole file was read; otherwise scaled up from the lines in the head
+    lines = text.count("\n") + (1 if text and not text.endswith("\n") else 0)
+    if head_bytes >= size or not text:
+        return lines
+    return round(text.count("\n") * size / head_bytes)
+
+@traced("github")
+def analyze_codebase(repo_full_name, max_files=50, snippet_lines=20, max_workers=None, churn=None,
+                     max_bytes=None, snippet_bytes=None):
+    """
+    Stream the repo listing once (one recursive tree request), updating the file count, extension
+    counts and a bounded heap of the largest files as records go by, and rank every file by
+    metadata alone (score_file: path, size, language, and churn, a {path: commits} Counter such as
+    get_commit_store(repo_full_name).churn()). Only the max_files best-ranked files are downloaded, and
+    only their first snippet_bytes (default ANALYSIS_SNIPPET_BYTES), until max_bytes (default
+    ANALYSIS_MAX_BYTES) have been spent; "bytes_downloaded" reports the total (revalidated cache hits
+    transfer nothing and count 0).
+    Memory stays flat in repo size: only the top-k heaps are held, and texts are dropped once summarized.
+    Returns a dict with largest files, most common extensions, and file summaries (best-ranked first).
+    Sizes, extensions and counts come from tree metadata; line counts only cover the summarized
+    files, and are estimated from the head for files bigger than snippet_bytes.
+    If the node's GitHub budget runs out mid-way, the files fetched so far are kept and
+    "incomplete" says why.
+    """
+    churn = churn or {}
+    max_bytes = ANALYSIS_MAX_BYTES if max_bytes is None else max_bytes
+    snippet_bytes = snippet_bytes or ANALYSIS_SNIPPET_BYTES
+    repo = open_repo(repo_full_name)
+    file_count = 0
+    ext_counter = Counter()
+    largest = []
+    ranked = []
+    for index, record in enumerate(iter_repo_files(repo)):
+        file_count += 1
+        ext_counter[record.extension] += 1
+        # Ties go to the file listed first, as with a stable sort
+        _push_top(largest, 5, (record.size, -index), record)
+        score = score_file(record.path, record.size, churn.get(record.path, 0))
+        if score > 0:
+            _push_top(ranked, max_files, (score, -index), record)
+    # Spend the byte budget on the best-ranked files first. Each file is charged its expected cost
+    # when it is queued and corrected to what it actually transferred when it arrives, so revalidated
+    # cache hits (0 bytes) leave room for more files
+    selected = []
+    budget = {"charged": 0}
+    def within_budget():
+        for record in _top(ranked):
+            cost = min(record.size, snippet_bytes)
+            if budget["charged"] + cost <= max_bytes:
+                budget["charged"] += cost
+                selected.append(record)
+                yield record
+    file_summaries = []
+    longest = []
+    bytes_downloaded = 0
+    incomplete = None
+    heads = fetch_blob_heads(repo, within_budget(), snippet_bytes, max_workers=max_workers)
+    try:
+        # Heads come back in order, and each one's record was queued (appended to selected) before it
+        for index, (text, received) in enumerate(heads):
+            f = selected[index]
+            budget["charged"] += received - min(f.size, snippet_bytes)
+            bytes_downloaded += received
+            lines = _line_estimate(text, f.size, min(f.size, snippet_bytes))
+            summary = {**f.as_dict(), "lines": lines, "snippet": _head_lines(text, snippet_lines)}
+            file_summaries.append(summary)
+            _push_top(longest, 5, (lines, -index), summary)
+    except GitHubBudgetExceeded as e:
+        incomplete = f"{e}; summarized {len(file_summaries)} of {len(selected)} files"
     return {
-        "largest_files": largest,
-        "most_lines_files": most_lines,
-        "most_common_extensions": most_common_ext,
-        "all_files_count": len(all_files),
-        "file_summaries": all_files[:max_files]  # limit for LLM context
-    } 
\ No newline at end of file
+        "largest_files": [f.as_dict() for f in _top(largest)],
+        "most_lines_files": _top(longest),
+        "most_common_extensions": ext_counter.most_common(5),
+        "all_files_count": file_count,
+        "file_summaries": file_summaries,  # limit for LLM context
+        "bytes_downloaded": bytes_downloaded,
+        "incomplete": incomplete
+    }
@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+CACHE_STATUS_HEADER = "X-Local-Cache"
+
+class HTTPCache:
+    """
+    On-disk response cache for conditional GETs, stored in a single SQLite file.
+    Entries are keyed by request URL (plus Accept/Authorization, and Range if set) and keep the body
+    together with the ETag / Last-Modified validators needed to revalidate them.
+    The total body size is capped; the least recently used entries are evicted first.
+    """
+    def __init__(self, cache_dir, max_bytes):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "bytes_saved": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "http_cache.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, url TEXT, etag TEXT, last_modified TEXT, "
+            "headers TEXT, body BLOB, size INTEGER, last_access REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses(last_access)")
+        self._db.commit()
+
+    @staticmethod
+    def make_key(request):
+        parts = [request.url, request.headers.get("Accept", ""), request.headers.get("Authorization", "")]
+        if "Range" in request.headers:
+            parts.append(request.headers["Range"])
+        return hashlib.sha256("\n".join(parts).encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT etag, last_modified, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if not row:
+            return None
+        etag, last_modified, headers, body = row
+        return {"etag": etag, "last_modified": last_modified, "headers": json.loads(headers), "body": body}
+
+    def record_hit(self, body):
+        """Count a revalidated hit (body served from the cache); safe to call from any thread."""
+        with self._lock:
+            self.stats["hits"] += 1
+            self.stats["bytes_saved"] += len(body)
+
+    def record_miss(self):
+        with self._lock:
+            self.stats["misses"] += 1
+
+    def touch(self, key, headers):
+        with self._lock:
+            self._db.execute(
+                "UPDATE responses SET headers = ?, last_access = ? WHERE key = ?",
+                (json.dumps(headers), time.time(), key)
+            )
+            self._db.commit()
+
+    def put(self, key, url, headers, body):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, headers.get("ETag"), headers.get("Last-Modified"),
+                 json.dumps(headers), body, len(body), time.time())
+            )
+            self.stats["stores"] += 1
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY last_access").fetchall():
+            self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.stats["evictions"] += 1
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+class CachingAdapter(requests.adapters.HTTPAdapter):
+    """
+    requests adapter that serves GETs from an HTTPCache.
+    Cached entries are revalidated with If-None-Match / If-Modified-Since; a 304 is
+    turned back into a 200 carrying the cached body, so callers never see the difference.
+    """
+    def __init__(self, cache, **kwargs):
+        super().__init__(**kwargs)
+        self.cache = cache
+
+    def send(self, request, stream=False, **kwargs):
+        if request.method != "GET" or stream:
+            return super().send(request, stream=stream, **kwargs)
+        key = self.cache.make_key(request)
+        entry = self.cache.get(key)
+        if entry:
+            if entry["etag"]:
+                request.headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                request.headers["If-Modified-Since"] = entry["last_modified"]
+        response = super().send(request, stream=stream, **kwargs)
+        if entry and response.status_code == 304:
+            self.cache.record_hit(entry["body"])
+            headers = dict(entry["headers"])
+            headers.update({k: v for k, v in response.headers.items()
+                            if k.lower() not in ("content-length", "transfer-encoding")})
+            self.cache.touch(key, headers)
+            # Lets callers (e.g. tracing) tell a revalidated cache hit from a full download
+            headers[CACHE_STATUS_HEADER] = "revalidated"
+            return self._cached_response(request, response, headers, entry["body"])
+        self.cache.record_miss()
+        if response.status_code == 200 and ("ETag" in response.headers or "Last-Modified" in response.headers):
+            headers = {k: v for k, v in response.headers.items()
+                       if k.lower() not in ("content-length", "content-encoding", "transfer-encoding")}
+            self.cache.put(key, request.url, headers, response.content)
+        return response
+
+    def _cached_response(self, request, fresh, headers, body):
+        response = requests.Response()
+        response.status_code = 200
+        response.reason = "OK"
+        response.headers = CaseInsensitiveDict(headers)
+        response._content = body
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        response.elapsed = fresh.elapsed
+        response.encoding = requests.utils.get_encoding_from_headers(response.headers)
+        return response
@@ -0,0 +1,95 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class LLMCache:
+    """
+    Two-tier cache of LLM responses: an in-memory LRU in front of a SQLite file on disk.
+    Keys are content hashes of (model, generation params, prompt); entries expire after ttl seconds.
+    Each entry remembers how many tokens and how much latency the original call cost,
+    so hits can be reported as tokens and seconds saved.
+    The disk tier drops expired rows and keeps at most disk_entries, least recently used going first.
+    """
+    def __init__(self, cache_dir, ttl, memory_entries=256, disk_entries=10000):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "tokens_saved": 0, "latency_saved": 0.0}
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(os.path.join(cache_dir, "llm_cache.sqlite3"), check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT, tokens INTEGER, latency REAL, created_at REAL)"
+        )
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(responses)")]
+        if "used_at" not in columns:
+            # Caches written before rows were evicted by last use
+            self._db.execute("ALTER TABLE responses ADD COLUMN used_at REAL")
+            self._db.execute("UPDATE responses SET used_at = created_at")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses (used_at)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)")
+        with self._lock:
+            self._prune()
+
+    @staticmethod
+    def make_key(model, generation_config, prompt):
+        payload = json.dumps({"model": model, "config": generation_config or {}, "prompt": prompt}, sort_keys=True)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            tier = "memory_hits"
+            if entry is None:
+                row = self._db.execute(
+                    "SELECT response, tokens, latency, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row:
+                    entry = dict(zip(("response", "tokens", "latency", "created_at"), row))
+                    tier = "disk_hits"
+            if entry is None or now - entry["created_at"] > self.ttl:
+                self.stats["misses"] += 1
+                return None
+            if tier == "disk_hits":
+                # Memory hits don't touch the disk; the row's last use is only as fresh as its last disk read
+                self._db.execute("UPDATE responses SET used_at = ? WHERE key = ?", (now, key))
+                self._db.commit()
+            self._remember(key, entry)
+            self.stats[tier] += 1
+            self.stats["tokens_saved"] += entry["tokens"]
+            self.stats["latency_saved"] += entry["latency"]
+            return entry["response"]
+
+    def put(self, key, response, tokens, latency):
+        entry = {"response": response, "tokens": tokens, "latency": latency, "created_at": time.time()}
+        with self._lock:
+            self._remember(key, entry)
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, tokens, latency, created_at, used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, response, tokens, latency, entry["created_at"], entry["created_at"])
+            )
+            self._prune()
+
+    def _prune(self):
+        # Caller holds the lock
+        self._db.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,))
+        self._db.execute(
+            "DELETE FROM responses WHERE key IN "
+            "(SELECT key FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+            (self.disk_entries,)
+        )
+        self._db.commit()
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
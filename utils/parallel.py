@@ -0,0 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from collections import defaultdict
+from utils.tracing import in_current_context
+import threading
+import time
+
+def map_bounded(fn, items, max_workers=8, timeout=None, key=None, per_key=None):
+    """
+    Run fn over items on a pool of max_workers threads and return the results in input order.
+    - key/per_key: at most per_key items with the same key(item) run at once (e.g. per host).
+    - timeout: seconds each item may take from submission, including time spent queued behind
+      other items of its key or for a free worker; late items are abandoned.
+    Items that raise or time out get the exception instance (TimeoutError for timeouts) as
+    their result, so one bad item never fails or stalls the whole batch.
+    """
+    items = list(items)
+    if not items:
+        return []
+    limits = defaultdict(lambda: threading.Semaphore(per_key)) if key and per_key else None
+    limits_lock = threading.Lock()
+    deadlines = {}
+
+    def run(i, item):
+        # Items whose time ran out while queued are not started at all
+        remaining = deadlines[i] - time.monotonic() if timeout else None
+        if remaining is not None and remaining <= 0:
+            raise TimeoutError(f"timed out after {timeout}s")
+        if limits is None:
+            return fn(item)
+        with limits_lock:
+            limit = limits[key(item)]
+        if not limit.acquire(timeout=remaining):
+            raise TimeoutError(f"timed out after {timeout}s")
+        try:
+            return fn(item)
+        finally:
+            limit.release()
+
+    results = [None] * len(items)
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        pending = {}
+        for i, item in enumerate(items):
+            if timeout:
+                deadlines[i] = time.monotonic() + timeout
+            pending[pool.submit(in_current_context(run), i, item)] = i
+        while pending:
+            done, _ = wait(pending, timeout=0.1 if timeout else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = pending.pop(future)
+                try:
+                    results[i] = future.result()
+                except Exception as e:
+                    results[i] = e
+            if timeout:
+                now = time.monotonic()
+                for future, i in list(pending.items()):
+                    if now > deadlines[i]:
+                        pending.pop(future)
+                        results[i] = TimeoutError(f"timed out after {timeout}s")
+    finally:
+        # Don't wait for abandoned (timed out) items
+        pool.shutdown(wait=False, cancel_futures=True)
+    return results
@@ -1,5 +1,8 @@
+import base64
 import os
-from github import Github
+from utils.github_client import get_repo
+from utils.edit_and_commit import git_blob_sha, remember_blob_shas
+from github import InputGitTreeElement, UnknownObjectException
 import yaml
 
 def load_preferences():
@@ -22,53 +25,77 @@ def load_preferences():
     with open(preferences_path, "r") as f:
         return yaml.safe_load(f)
 
-def create_blog_file_and_pr(blog_markdown, blog_title, branch_name, pr_title, pr_body):
+def post_file_name(blog_title):
+    return blog_title.lower().replace(" ", "-") + ".md"
+
+def _tree_element(repo, path, content):
+    # Text goes inline in the tree request. The API only takes UTF-8 text inline, so each
+    # binary file (images, ...) costs one blob request of its own
+    if isinstance(content, bytes):
+        try:
+            content = content.decode("utf-8")
+        except UnicodeDecodeError:
+            blob = repo.create_git_blob(base64.b64encode(content).decode(), "base64")
+            return InputGitTreeElement(path, "100644", "blob", sha=blob.sha)
+    return InputGitTreeElement(path, "100644", "blob", content=content)
+
+def publish_files(repo, files, branch_name, message, base_branch="main"):
     """
-    Create a new markdown file, push a branch, and open a PR to the blog repo.
-    Uses preferences.yaml for repo and directory info.
+    Land files ({repo path: str or bytes}) on branch_name as one commit via the Git Data API:
+    resolve the branch (or the base branch, if it doesn't exist yet), create one tree (plus a
+    blob per binary file) and one commit on top of it, then create or fast-forward the ref.
+    That is 4-5 requests however many text files there are, plus one per binary file.
+    Returns (new commit SHA, whether the branch was created).
+    """
+    try:
+        parent = repo.get_branch(branch_name).commit.commit
+        exists = True
+    except UnknownObjectException:
+        parent = repo.get_branch(base_branch).commit.commit
+        exists = False
+    elements = [_tree_element(repo, path, content) for path, content in files.items()]
+    tree = repo.create_git_tree(elements, parent.tree)
+    commit = repo.create_git_commit(message, tree, [parent])
+    if exists:
+        repo.get_git_ref(f"heads/{branch_name}").edit(commit.sha)
+    else:
+        repo.create_git_ref(ref=f"refs/heads/{branch_name}", sha=commit.sha)
+    return commit.sha, not exists
+
+def create_posts_pr(posts, branch_name, pr_title, pr_body, assets=None):
+    """
+    Publish several posts ({file name: markdown}) and their assets ({file name: bytes}, stored
+    under the assets_dir preference) in a single commit on branch_name, then open a PR.
+    Uses preferences.yaml for repo and directory info. Returns the PR URL.
     """
     preferences = load_preferences()
-    repo_name = preferences["repo"]
     posts_dir = preferences["posts_dir"]
+    assets_dir = preferences.get("assets_dir", "static/images")
     base_branch = preferences.get("base_branch", "main")
     pr_base = preferences.get("pr_base", base_branch)
-    file_name = blog_title.lower().replace(" ", "-") + ".md"
-    file_path = f"{posts_dir}/{file_name}"
-    g = Github(os.environ["GITHUB_TOKEN"])
-    repo = g.get_repo(repo_name)
-    # Get latest commit SHA of base branch
-    base = repo.get_branch(base_branch)
-    base_sha = base.commit.sha
-    # Create new branch
-    ref = f"refs/heads/{branch_name}"
-    try:
-        repo.create_git_ref(ref=ref, sha=base_sha)
-    except Exception as e:
-        # Branch may already exist
-        pass
-    # Create or update the file in the new branch
-    try:
-        repo.create_file(
-            path=file_path,
-            message=pr_title,
-            content=blog_markdown,
-            branch=branch_name
-        )
-    except Exception as e:
-        # If file exists, update it
-        contents = repo.get_contents(file_path, ref=branch_name)
-        repo.update_file(
-            path=file_path,
-            message=pr_title,
-            content=blog_markdown,
-            sha=contents.sha,
-            branch=branch_name
-        )
-    # Create PR
+    repo = get_repo(preferences["repo"])
+    files = {f"{posts_dir}/{name}": markdown for name, markdown in posts.items()}
+    files.update({f"{assets_dir}/{name}": content for name, content in (assets or {}).items()})
+    _, created = publish_files(repo, files, branch_name, pr_title, base_branch)
+    # Later edit-commits of these posts can then update them without looking up their SHAs
+    remember_blob_shas(repo.full_name, branch_name,
+                       {path: git_blob_sha(content) for path, content in files.items()})
+    if not created:
+        # Publishing again to a branch (publish --branch, a resumed run) updates the PR it already has
+        owner = repo.full_name.split("/")[0]
+        for pr in repo.get_pulls(state="open", head=f"{owner}:{branch_name}"):
+            return pr.html_url
     pr = repo.create_pull(
         title=pr_title,
         body=pr_body,
         head=branch_name,
         base=pr_base
     )
-    return pr.html_url 
\ No newline at end of file
+    return pr.html_url
+
+def create_blog_file_and_pr(blog_markdown, blog_title, branch_name, pr_title, pr_body, assets=None):
+    """
+    Create a new markdown file (plus any assets), push it to a branch in one commit, and open a PR to the blog repo.
+    Uses preferences.yaml for repo and directory info.
+    """
+    return create_posts_pr({post_file_name(blog_title): blog_markdown}, branch_name, pr_title, pr_body, assets)
@@ -0,0 +1,125 @@
+from collections import Counter
+import os
+
+# Token budgets for the assembled prompts (estimated, see estimate_tokens)
+DRAFT_PROMPT_TOKEN_BUDGET = int(os.environ.get("DRAFT_PROMPT_TOKEN_BUDGET", "12000"))
+KEYWORD_PROMPT_TOKEN_BUDGET = int(os.environ.get("KEYWORD_PROMPT_TOKEN_BUDGET", "4000"))
+
+def estimate_tokens(text):
+    """Rough token estimate (~4 characters per token); good enough for budgeting prompts."""
+    return (len(text) + 3) // 4
+
+def truncate_to_tokens(text, max_tokens):
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars]
+    # Prefer cutting at a line break so code and lists stay readable
+    newline = cut.rfind("\n")
+    if newline > max_chars // 2:
+        cut = cut[:newline]
+    return cut + "\n[...truncated]"
+
+def pack_sections(sections, budget, reserved=0, min_truncated_tokens=64):
+    """
+    Fit prompt sections into a token budget.
+    sections is a list of {"name", "priority", "items"} dicts (optional "separator", default a blank line).
+    Sections are filled in priority order (lowest first), items in list order. Items already seen
+    (ignoring whitespace) are dropped as duplicates; an item that doesn't fit is truncated if at
+    least min_truncated_tokens remain, otherwise dropped. reserved is the cost of the fixed prompt text.
+    Returns {"texts": {name: packed text}, "tokens", "budget", "dropped": [...], "truncated": [...]}.
+    """
+    remaining = budget - reserved
+    seen = set()
+    kept = {section["name"]: [] for section in sections}
+    dropped = []
+    truncated = []
+    for section in sorted(sections, key=lambda s: s["priority"]):
+        name = section["name"]
+        for i, item in enumerate(section["items"]):
+            if not item or not item.strip():
+                continue
+            normalized = " ".join(item.split())
+            cost = estimate_tokens(item)
+            if normalized in seen:
+                dropped.append({"section": name, "index": i, "tokens": cost, "reason": "duplicate"})
+                continue
+            seen.add(normalized)
+            if cost <= remaining:
+                kept[name].append(item)
+                remaining -= cost
+            elif remaining >= min_truncated_tokens:
+                kept[name].append(truncate_to_tokens(item, remaining))
+                truncated.append({"section": name, "index": i, "tokens": cost, "kept_tokens": remaining})
+                remaining = 0
+            else:
+                dropped.append({"section": name, "index": i, "tokens": cost, "reason": "budget"})
+    texts = {
+        section["name"]: section.get("separator", "\n\n").join(kept[section["name"]])
+        for section in sections
+    }
+    return {
+        "texts": texts,
+        "tokens": budget - remaining,
+        "budget": budget,
+        "dropped": dropped,
+        "truncated": truncated
+    }
+
+def format_pack_report(report):
+    """One-line summary of what pack_sections kept, truncated and dropped."""
+    line = f"Prompt ~{report['tokens']}/{report['budget']} tokens"
+    if report["truncated"]:
+        line += "; truncated: " + ", ".join(t["section"] for t in report["truncated"])
+    if report["dropped"]:
+        counts = Counter(d["section"] for d in report["dropped"])
+        line += f"; dropped {len(report['dropped'])} items (" + ", ".join(f"{s}: {n}" for s, n in counts.items()) + ")"
+    return line
+
+def format_commits(commits):
+    """One line per commit: date, short sha, first line of the message, and its size when known."""
+    lines = []
+    for c in commits:
+        message = (c.get("message") or "").strip().splitlines()
+        line = f"- {c.get('date', '')[:10]} {c.get('sha', '')[:7]} {message[0] if message else ''}"
+        if c.get("additions") is not None:
+            line += f" (+{c['additions']}/-{c['deletions']})"
+        lines.append(line)
+    return lines
+
+def format_changes_since(commits, since, top_paths=10):
+    """Overview of the commits since a date: totals, then the most frequently changed paths."""
+    if not since or not commits:
+        return []
+    additions = sum(c.get("additions") or 0 for c in commits)
+    deletions = sum(c.get("deletions") or 0 for c in commits)
+    lines = [f"{len(commits)} commits since {since[:10]} (+{additions}/-{deletions} lines)"]
+    paths = Counter(path for c in commits for path in c.get("files", []))
+    if paths:
+        lines.append("Most changed: " + ", ".join(f"{path} ({n})" for path, n in paths.most_common(top_paths)))
+    return lines
+
+def format_key_files(key_files):
+    return [f"{f['name']}:\n```\n{f['snippet']}\n```" for f in key_files if f.get("snippet")]
+
+def format_codebase_overview(insights):
+    """Compact text for the repo-level stats in analyze_codebase's result (no file snippets)."""
+    if not insights:
+        return ""
+    lines = [f"Files: {insights.get('all_files_count', 0)}"]
+    if insights.get("most_common_extensions"):
+        lines.append("Most common extensions: " + ", ".join(f"{ext or '(none)'} ({n})" for ext, n in insights["most_common_extensions"]))
+    if insights.get("largest_files"):
+        lines.append("Largest files: " + ", ".join(f"{f['path']} ({f['size']} bytes)" for f in insights["largest_files"]))
+    if insights.get("most_lines_files"):
+        lines.append("Longest files: " + ", ".join(f"{f['path']} ({f['lines']} lines)" for f in insights["most_lines_files"]))
+    return "\n".join(lines)
+
+def format_file_snippets(insights):
+    snippets = []
+    for f in (insights or {}).get("file_summaries", []):
+        if not f.get("snippet"):
+            continue
+        header = f"{f['path']} - {f['summary']}" if f.get("summary") else f["path"]
+        snippets.append(f"{header}:\n```\n{f['snippet']}\n```")
+    return snippets
@@ -0,0 +1,224 @@
+from contextlib import contextmanager
+import contextvars
+import email.utils
+import os
+import random
+import threading
+import time
+import requests
+import urllib3
+
+# Attempts per request on secondary limits (403/429 + Retry-After), 5xx and connection errors
+GITHUB_MAX_RETRIES = int(os.environ.get("GITHUB_MAX_RETRIES", "5"))
+# Jittered exponential backoff between retries: base * 2^attempt, capped at max (seconds)
+GITHUB_BACKOFF_BASE = float(os.environ.get("GITHUB_BACKOFF_BASE", "1"))
+GITHUB_BACKOFF_MAX = float(os.environ.get("GITHUB_BACKOFF_MAX", "60"))
+# First wait after a secondary limit that came without Retry-After, doubled on each repeat (seconds)
+GITHUB_SECONDARY_LIMIT_WAIT = float(os.environ.get("GITHUB_SECONDARY_LIMIT_WAIT", "60"))
+# Longest we wait for a primary quota reset before failing the run instead (seconds)
+GITHUB_MAX_RATE_LIMIT_WAIT = float(os.environ.get("GITHUB_MAX_RATE_LIMIT_WAIT", "300"))
+# Once fewer requests than this are left, spread the rest evenly until the quota resets
+GITHUB_PACE_BELOW = int(os.environ.get("GITHUB_PACE_BELOW", "500"))
+# Minimum gap between content-creating requests (POST/PATCH/PUT/DELETE), as GitHub asks (seconds)
+GITHUB_WRITE_INTERVAL = float(os.environ.get("GITHUB_WRITE_INTERVAL", "1"))
+# Per-node request budgets overriding the nodes' defaults, e.g. "RepoAnalyzerNode=800,BlogContextNode=400"
+GITHUB_NODE_BUDGETS = {
+    name.strip(): int(limit)
+    for name, _, limit in (item.partition("=") for item in os.environ.get("GITHUB_NODE_BUDGETS", "").split(","))
+    if name.strip() and limit.strip()
+}
+
+RETRY_STATUSES = (500, 502, 503, 504)
+
+class GitHubRateLimitError(Exception):
+    """The GitHub quota is exhausted (or we were throttled) for longer than we are willing to wait."""
+
+class GitHubBudgetExceeded(Exception):
+    """A node used up its GitHub request budget."""
+
+class RequestBudget:
+    """Request allowance for one node run, shared by every thread working on its behalf."""
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self.used = 0
+        self._lock = threading.Lock()
+
+    def charge(self):
+        with self._lock:
+            if self.used >= self.limit:
+                raise GitHubBudgetExceeded(f"{self.name} used its budget of {self.limit} GitHub requests")
+            self.used += 1
+
+_budget = contextvars.ContextVar("github_budget", default=None)
+
+@contextmanager
+def request_budget(name, limit):
+    """
+    Cap the GitHub requests made inside the block at limit (GITHUB_NODE_BUDGETS[name] if set).
+    Worker threads started with tracing.in_current_context draw from the same budget.
+    """
+    limit = GITHUB_NODE_BUDGETS.get(name, limit)
+    if limit is None:
+        yield None
+        return
+    budget = RequestBudget(name, limit)
+    token = _budget.set(budget)
+    try:
+        yield budget
+    finally:
+        _budget.reset(token)
+
+def _never_sent(error):
+    # Only a failure to connect proves the request never reached the server; a reset or read
+    # timeout afterwards may come after GitHub already acted on it
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, urllib3.exceptions.ConnectTimeoutError)
+
+def _is_secondary_limit(response):
+    if response.status == 429:
+        return True
+    read = getattr(response, "read", None)
+    body = (read() if read else "") or ""
+    return "secondary rate limit" in body.lower() or "abuse" in body.lower()
+
+def _retry_after_seconds(value):
+    # Retry-After is either delta-seconds or an HTTP date
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(parsed.timestamp() - time.time(), 0.0)
+
+class RateLimitScheduler:
+    """
+    Paces and retries every GitHub request, tracking the quota per rate-limit resource
+    (core, graphql, ...) from the X-RateLimit-* headers of each response.
+    - Requests run unthrottled while plenty of quota is left; below GITHUB_PACE_BELOW the
+      remaining requests are spread evenly until the reset time.
+    - A Retry-After (secondary limit) pauses all requests to that resource, not just the one that hit it;
+      a secondary limit without one pauses GITHUB_SECONDARY_LIMIT_WAIT, doubling on each repeat.
+    - An exhausted primary quota is waited out if it resets within GITHUB_MAX_RATE_LIMIT_WAIT,
+      otherwise GitHubRateLimitError is raised.
+    - Writes are spaced GITHUB_WRITE_INTERVAL apart; reads (including GraphQL queries) are not.
+    - 5xx responses and connection errors are retried with jittered exponential backoff; requests
+      that are not idempotent (POST, PATCH) only when the connection failed before anything was sent.
+    """
+    def __init__(self, max_retries=None):
+        self.max_retries = GITHUB_MAX_RETRIES if max_retries is None else max_retries
+        self.quotas = {}
+        self._next_write = 0.0
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "waited": 0.0}
+        self._lock = threading.Lock()
+
+    def _quota(self, resource):
+        return self.quotas.setdefault(resource, {"remaining": None, "limit": None, "reset": 0.0,
+                                                 "paused_until": 0.0, "next_slot": 0.0})
+
+    def _reserve(self, resource, write):
+        # Returns how long the caller must wait before sending
+        with self._lock:
+            now = time.time()
+            quota = self._quota(resource)
+            start = max(now, quota["paused_until"])
+            if write:
+                start = max(start, self._next_write)
+                self._next_write = start + GITHUB_WRITE_INTERVAL
+            remaining = quota["remaining"]
+            if remaining is not None and remaining <= GITHUB_PACE_BELOW and quota["reset"] > now:
+                if remaining <= 0:
+                    start = max(start, quota["reset"] + 1)
+                else:
+                    start = max(start, quota["next_slot"])
+                    quota["next_slot"] = start + (quota["reset"] - now) / remaining
+            if remaining is not None:
+                # Count requests in flight, so concurrent callers don't all see the same quota
+                quota["remaining"] = remaining - 1
+            return start - now
+
+    def _record(self, resource, headers):
+        remaining = headers.get("X-RateLimit-Remaining")
+        if remaining is None:
+            return
+        resource = headers.get("X-RateLimit-Resource", resource)
+        with self._lock:
+            quota = self._quota(resource)
+            quota["remaining"] = int(remaining)
+            quota["limit"] = int(headers.get("X-RateLimit-Limit", 0)) or quota["limit"]
+            quota["reset"] = float(headers.get("X-RateLimit-Reset", 0)) or quota["reset"]
+
+    def _wait(self, seconds):
+        if seconds > 0:
+            with self._lock:
+                self.stats["waited"] += seconds
+            time.sleep(seconds)
+
+    def backoff(self, attempt):
+        return min(GITHUB_BACKOFF_MAX, GITHUB_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+
+    def send(self, resource, do_request, write=False, idempotent=True):
+        """
+        Send a request through do_request() (returning an object with .status and .headers, and
+        optionally .read() for the body), charging the caller's request budget once.
+        Returns the final response.
+        """
+        budget = _budget.get()
+        if budget is not None:
+            budget.charge()
+        for attempt in range(self.max_retries + 1):
+            delay = self._reserve(resource, write)
+            if delay > GITHUB_MAX_RATE_LIMIT_WAIT:
+                raise GitHubRateLimitError(f"GitHub {resource} quota is too low to go on: the next request would wait {delay:.0f}s")
+            self._wait(delay)
+            with self._lock:
+                self.stats["requests"] += 1
+            try:
+                response = do_request()
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries or not (idempotent or _never_sent(e)):
+                    raise
+                self._wait(self.backoff(attempt))
+                continue
+            self._record(resource, response.headers)
+            wait = self._retry_delay(resource, response, attempt)
+            if wait is None:
+                return response
+            if attempt == self.max_retries:
+                if response.status in RETRY_STATUSES:
+                    return response
+                raise GitHubRateLimitError(f"GitHub kept throttling requests ({response.status}) after {attempt + 1} attempts")
+            with self._lock:
+                self.stats["retries"] += 1
+            self._wait(max(wait, self.backoff(attempt)))
+
+    def _retry_delay(self, resource, response, attempt=0):
+        # None when the response is final; otherwise seconds to wait before retrying
+        if response.status in RETRY_STATUSES:
+            return 0.0
+        if response.status not in (403, 429):
+            return None
+        retry_after = response.headers.get("Retry-After")
+        with self._lock:
+            quota = self._quota(response.headers.get("X-RateLimit-Resource", resource))
+            if retry_after is not None:
+                wait = _retry_after_seconds(retry_after)
+            elif quota["remaining"] == 0:
+                wait = quota["reset"] - time.time() + 1
+            elif _is_secondary_limit(response):
+                # GitHub asks for at least a minute, then exponentially longer while it persists
+                wait = GITHUB_SECONDARY_LIMIT_WAIT * 2 ** attempt
+            else:
+                # A plain 403 (permissions, not found in disguise, ...) is not ours to retry
+                return None
+            self.stats["throttled"] += 1
+            if wait > GITHUB_MAX_RATE_LIMIT_WAIT:
+                raise GitHubRateLimitError(f"GitHub {resource} rate limit hit; retry allowed in {wait:.0f}s")
+            # Everyone backs off, not just this request
+            quota["paused_until"] = max(quota["paused_until"], time.time() + wait)
+        return wait
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "quotas": {name: dict(q) for name, q in self.quotas.items()}}
@@ -0,0 +1,158 @@
+import base64
+import os
+import subprocess
+import threading
+import time
+from utils.tracing import span, tracer
+
+# Where repo contents come from: "api" (GitHub REST API) or "mirror" (a local git mirror, no API calls)
+REPO_SOURCE = os.environ.get("REPO_SOURCE", "api")
+# Where bare git mirrors of analyzed repos are kept
+REPO_MIRROR_DIR = os.environ.get("REPO_MIRROR_DIR", os.path.join(".cache", "mirrors"))
+# Clone URL for a repo; {repo} is owner/name. A local path template (e.g. /srv/git/{repo}) works too
+REPO_MIRROR_URL = os.environ.get("REPO_MIRROR_URL", "https://github.com/{repo}.git")
+# Seconds a mirror is trusted before the next incremental fetch (0 = fetch on every analysis)
+REPO_MIRROR_MAX_AGE = int(os.environ.get("REPO_MIRROR_MAX_AGE", "600"))
+# Optional partial-clone filter, e.g. "blob:limit=1m" to leave huge binaries on the server (they read as empty)
+REPO_MIRROR_FILTER = os.environ.get("REPO_MIRROR_FILTER", "")
+
+_lock = threading.Lock()
+_mirrors = {}
+_mirror_locks = {}
+
+def _git_env(url):
+    env = dict(os.environ, GIT_TERMINAL_PROMPT="0")
+    token = os.environ.get("GITHUB_TOKEN")
+    if token and url.startswith("https://"):
+        # Passed through the environment rather than argv, so the token never shows up in `ps`
+        basic = base64.b64encode(f"x-access-token:{token}".encode()).decode()
+        env.update(GIT_CONFIG_COUNT="1", GIT_CONFIG_KEY_0="http.extraHeader",
+                   GIT_CONFIG_VALUE_0=f"Authorization: Basic {basic}")
+    return env
+
+def run_git(args, cwd=None, env=None, input=None):
+    """Run a git command (input, if given, as bytes on stdin) and return its stdout; raises CalledProcessError if git fails."""
+    return subprocess.run(["git", *args], cwd=cwd, env=env, input=input, check=True, capture_output=True).stdout
+
+class RepoMirror:
+    """
+    Read-only view of a local bare mirror: file listing, blobs and README, all from disk
+    (the log goes straight into the commit store, see utils.commit_store).
+    Blobs come from a single long-lived `git cat-file --batch`, which serves them from git's
+    mmapped pack files, so reading thousands of files costs no process spawns and no requests.
+    """
+    def __init__(self, repo_full_name, path):
+        self.full_name = repo_full_name
+        self.path = path
+        self._cat_file = None
+        self._cat_lock = threading.Lock()
+
+    def iter_files(self, recursive=True):
+        """Stream (path, size, sha) of every blob at HEAD, or only the top-level ones."""
+        args = ["git", "ls-tree", "-z", "-l"] + (["-r"] if recursive else []) + ["HEAD"]
+        proc = subprocess.Popen(args, cwd=self.path, stdout=subprocess.PIPE)
+        try:
+            pending = b""
+            for chunk in iter(lambda: proc.stdout.read(64 * 1024), b""):
+                entries = (pending + chunk).split(b"\0")
+                pending = entries.pop()
+                for entry in entries:
+                    meta, path = entry.split(b"\t", 1)
+                    _, kind, sha, size = meta.split()
+                    if kind == b"blob":
+                        yield path.decode(errors="replace"), int(size), sha.decode()
+        finally:
+            # If the caller stopped early, closing the pipe makes git exit
+            proc.stdout.close()
+            proc.wait()
+        if proc.returncode:
+            raise subprocess.CalledProcessError(proc.returncode, args)
+
+    def read_blob(self, sha):
+        """Raw bytes of a blob (b"" if the mirror does not have it)."""
+        with self._cat_lock:
+            if self._cat_file is None:
+                # No lazy fetching of filtered-out blobs: reads stay on disk
+                self._cat_file = subprocess.Popen(["git", "cat-file", "--batch"], cwd=self.path,
+                                                  env=dict(os.environ, GIT_NO_LAZY_FETCH="1"),
+                                                  stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            self._cat_file.stdin.write(sha.encode() + b"\n")
+            self._cat_file.stdin.flush()
+            header = self._cat_file.stdout.readline().split()
+            if len(header) != 3:
+                return b""
+            data = self._cat_file.stdout.read(int(header[2]))
+            self._cat_file.stdout.read(1)
+            return data
+
+    def readme(self):
+        names = {path.lower(): sha for path, _, sha in self.iter_files(recursive=False)}
+        for name in ["readme.md", "readme.rst", "readme.txt", "readme"] + sorted(names):
+            if name in names and name.startswith("readme"):
+                return self.read_blob(names[name]).decode(errors="ignore")
+        return ""
+
+    def close(self):
+        with self._cat_lock:
+            if self._cat_file is not None:
+                self._cat_file.stdin.close()
+                self._cat_file.wait()
+                self._cat_file = None
+
+def _last_fetch_path(path):
+    return os.path.join(path, "last_fetch")
+
+def _clone(repo_full_name, path):
+    url = REPO_MIRROR_URL.format(repo=repo_full_name)
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    args = ["clone", "--bare", "--quiet", "--no-tags"]
+    if REPO_MIRROR_FILTER:
+        args.append(f"--filter={REPO_MIRROR_FILTER}")
+    run_git(args + [url, tmp_path], env=_git_env(url))
+    # Keep the mirror's branches in step with the remote on later fetches
+    run_git(["config", "remote.origin.fetch", "+refs/heads/*:refs/heads/*"], cwd=tmp_path)
+    os.replace(tmp_path, path)
+
+def _fetch(repo_full_name, path):
+    # Only objects the mirror does not have yet are transferred
+    url = REPO_MIRROR_URL.format(repo=repo_full_name)
+    run_git(["fetch", "--quiet", "--prune", "--no-tags", "origin"], cwd=path, env=_git_env(url))
+
+def _mirror_path(repo_full_name):
+    return os.path.join(REPO_MIRROR_DIR, *repo_full_name.split("/")) + ".git"
+
+def find_mirror(repo_full_name):
+    """The repo's mirror if one was already cloned (kept up to date like get_mirror), else None; never clones."""
+    if not os.path.isdir(_mirror_path(repo_full_name)):
+        return None
+    return get_mirror(repo_full_name)
+
+def get_mirror(repo_full_name, max_age=None):
+    """
+    The local mirror of a repo: cloned on first use, then updated with an incremental fetch
+    once it is older than max_age seconds (default REPO_MIRROR_MAX_AGE). If a fetch fails
+    (offline, remote down) an existing mirror is used as is.
+    """
+    max_age = REPO_MIRROR_MAX_AGE if max_age is None else max_age
+    with _lock:
+        mirror_lock = _mirror_locks.setdefault(repo_full_name, threading.Lock())
+    with mirror_lock:
+        path = _mirror_path(repo_full_name)
+        marker = _last_fetch_path(path)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with span(f"git clone {repo_full_name}", "git"):
+                _clone(repo_full_name, path)
+            tracer.count(git_fetches=1)
+            open(marker, "w").close()
+        elif not os.path.exists(marker) or time.time() - os.path.getmtime(marker) >= max_age:
+            try:
+                with span(f"git fetch {repo_full_name}", "git"):
+                    _fetch(repo_full_name, path)
+                tracer.count(git_fetches=1)
+                open(marker, "w").close()
+            except subprocess.CalledProcessError:
+                pass
+        if repo_full_name not in _mirrors:
+            _mirrors[repo_full_name] = RepoMirror(repo_full_name, path)
+        return _mirrors[repo_full_name]
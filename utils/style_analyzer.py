@@ -1,16 +1,78 @@
 from utils.call_llm import call_llm
-import re
+from utils.tracing import traced
 from collections import Counter
+import hashlib
+import json
+import os
+import re
+
+# Persistent per-post style aggregates and the last LLM style summary
+STYLE_PROFILE_PATH = os.environ.get("STYLE_PROFILE_PATH", os.path.join(".cache", "style_profile.json"))
+STYLE_PROFILE_VERSION = 1
+
+EMOJI_PATTERN = re.compile(r"[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]")
+
+def load_style_profile(path=None):
+    path = path or STYLE_PROFILE_PATH
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            profile = json.load(f)
+        if profile.get("version") == STYLE_PROFILE_VERSION:
+            return profile
+    except (OSError, ValueError):
+        pass
+    return {"version": STYLE_PROFILE_VERSION, "posts": {}, "corpus_key": None, "llm_style_summary": None}
+
+def save_style_profile(profile, path=None):
+    path = path or STYLE_PROFILE_PATH
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(profile, f)
+    os.replace(tmp_path, path)
+
+def post_style_stats(content):
+    """Heuristic partial aggregates for a single post; analyze_style sums these across the corpus."""
+    lines = content.splitlines()
+    return {
+        "headings": [line.strip() for line in lines if line.strip().startswith("#")],
+        "opening_line": lines[0].strip() if lines else None,
+        "closing_line": lines[-1].strip() if lines else None,
+        "emoji_count": len(EMOJI_PATTERN.findall(content)),
+        "code_blocks": content.count("```"),
+        "word_counts": dict(Counter(re.findall(r"\b\w+\b", content.lower()))),
+        "length": len(content)
+    }
 
-def analyze_style(blog_texts, new_draft=None):
+def _post_key(blog, content):
+    if isinstance(blog, dict) and blog.get("sha"):
+        return blog["sha"]
+    return hashlib.sha1(content.encode()).hexdigest()
+
+@traced()
+def analyze_style(blog_texts, new_draft=None, profile_path=None):
     """
     Analyze a list of blog texts for tone, structure, and signature elements using both heuristics and LLM.
     If new_draft is provided, compare its style to previous blogs using the LLM.
+    Per-post heuristics and the LLM style summary are kept in a persistent profile keyed by
+    each post's git sha, so only new or edited posts are re-processed and an unchanged
+    corpus costs no LLM call.
     Returns a dict with:
       - heuristic analysis (as before)
       - llm_style_summary (LLM's description of the style)
       - llm_similarity (LLM's assessment of similarity if new_draft is provided)
     """
+    profile = load_style_profile(profile_path)
+    cached_posts = profile["posts"]
+    posts = {}
+    keys = []
+    all_contents = []
+    for blog in blog_texts:
+        content = blog["content"] if isinstance(blog, dict) else blog
+        all_contents.append(content)
+        key = _post_key(blog, content)
+        keys.append(key)
+        posts[key] = cached_posts.get(key) or post_style_stats(content)
     headings = []
     opening_lines = []
     closing_lines = []
@@ -18,25 +80,16 @@ def analyze_style(blog_texts, new_draft=None):
     code_blocks = 0
     word_counter = Counter()
     total_length = 0
-    all_contents = []
-    for blog in blog_texts:
-        content = blog["content"] if isinstance(blog, dict) else blog
-        all_contents.append(content)
-        lines = content.splitlines()
-        # Headings
-        headings += [line.strip() for line in lines if line.strip().startswith("#")]
-        # Opening/closing
-        if lines:
-            opening_lines.append(lines[0].strip())
-            closing_lines.append(lines[-1].strip())
-        # Emoji
-        emoji_count += len(re.findall(r"[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF]", content))
-        # Code blocks
-        code_blocks += content.count("```")
-        # Words
-        words = re.findall(r"\b\w+\b", content.lower())
-        word_counter.update(words)
-        total_length += len(content)
+    for key in keys:
+        stats = posts[key]
+        headings += stats["headings"]
+        if stats["opening_line"] is not None:
+            opening_lines.append(stats["opening_line"])
+            closing_lines.append(stats["closing_line"])
+        emoji_count += stats["emoji_count"]
+        code_blocks += stats["code_blocks"]
+        word_counter.update(stats["word_counts"])
+        total_length += stats["length"]
     n = len(blog_texts) or 1
     heuristics = {
         "common_headings": [h for h, _ in Counter(headings).most_common(5)],
@@ -47,10 +100,21 @@ def analyze_style(blog_texts, new_draft=None):
         "code_blocks_per_post": code_blocks / n,
         "most_common_words": [w for w, _ in word_counter.most_common(10)]
     }
-    # LLM style summary
-    style_prompt = f"""
+    # LLM style summary, reused while the corpus is unchanged
+    corpus_key = hashlib.sha1("\n".join(keys).encode()).hexdigest()
+    if profile["corpus_key"] == corpus_key and profile["llm_style_summary"]:
+        llm_style_summary = profile["llm_style_summary"]
+    else:
+        style_prompt = f"""
 You are an expert writing coach. Analyze the following set of blog posts and describe the author's writing style, tone, and structure in detail. List any signature elements or recurring patterns.\n\nBLOGS:\n---\n{chr(10).join(all_contents[:3])}\n---\n"""
-    llm_style_summary = call_llm(style_prompt)
+        llm_style_summary = call_llm(style_prompt)
+    if posts != cached_posts or profile["corpus_key"] != corpus_key or profile["llm_style_summary"] != llm_style_summary:
+        save_style_profile({
+            "version": STYLE_PROFILE_VERSION,
+            "posts": posts,
+            "corpus_key": corpus_key,
+            "llm_style_summary": llm_style_summary
+        }, profile_path)
     llm_similarity = None
     if new_draft:
         compare_prompt = f"""
@@ -0,0 +1,121 @@
+from contextlib import contextmanager
+from pocketflow import Node
+from utils.rate_limit import request_budget
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+
+class Tracer:
+    """
+    Collects spans as Chrome trace "complete" events (viewable in chrome://tracing or Perfetto).
+    Disabled by default; `main.py profile` enables it. Each node span also aggregates counters
+    (GitHub requests, LLM calls, cache hits, ...) recorded anywhere inside it, including in
+    worker threads started with in_current_context.
+    """
+    def __init__(self):
+        self.enabled = False
+        self.events = []
+        self.node_stats = {}
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+
+    def reset(self):
+        with self._lock:
+            self.events = []
+            self.node_stats = {}
+            self._start = time.perf_counter()
+
+    def add_event(self, name, cat, start, end, args):
+        with self._lock:
+            self.events.append({
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": (start - self._start) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args
+            })
+
+    def count(self, **counters):
+        """Add counters to the node span the caller is running under."""
+        node = _current_node.get()
+        if not self.enabled or node is None:
+            return
+        with self._lock:
+            stats = self.node_stats[node]
+            for key, value in counters.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats[key] = stats.get(key, 0) + value
+                else:
+                    stats[key] = value
+
+    def write_chrome_trace(self, path):
+        with self._lock:
+            data = {"traceEvents": list(self.events), "displayTimeUnit": "ms"}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+tracer = Tracer()
+_current_node = contextvars.ContextVar("current_node", default=None)
+
+@contextmanager
+def span(name, cat="function", **args):
+    """Record the enclosed block as a trace span (no-op while tracing is disabled)."""
+    if not tracer.enabled:
+        yield args
+        return
+    start = time.perf_counter()
+    try:
+        yield args
+    finally:
+        tracer.add_event(name, cat, start, time.perf_counter(), args)
+
+@contextmanager
+def node_span(name):
+    """Span for a whole node run; counters recorded inside it are attributed to name."""
+    if not tracer.enabled:
+        yield
+        return
+    with tracer._lock:
+        tracer.node_stats.setdefault(name, {"runs": 0, "wall_time": 0.0})
+    token = _current_node.set(name)
+    start = time.perf_counter()
+    try:
+        with span(name, "node"):
+            yield
+    finally:
+        _current_node.reset(token)
+        with tracer._lock:
+            tracer.node_stats[name]["runs"] += 1
+            tracer.node_stats[name]["wall_time"] += time.perf_counter() - start
+
+def traced(cat="function"):
+    """Decorator recording every call of a utility function as a span."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(fn.__name__, cat):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def in_current_context(fn):
+    """Bind fn to the caller's context, so spans and counters in a worker thread stay attributed to the caller's node."""
+    return functools.partial(contextvars.copy_context().run, fn)
+
+class TracedNode(Node):
+    """
+    pocketflow Node whose runs are recorded as a node span and capped at github_budget
+    GitHub requests (None for no cap; see rate_limit.request_budget).
+    """
+    github_budget = None
+
+    def _run(self, shared):
+        name = type(self).__name__
+        with node_span(name), request_budget(name, self.github_budget):
+            return super()._run(shared)
@@ -1,6 +1,27 @@
 from duckduckgo_search import DDGS
+from bs4 import BeautifulSoup
+import os
+import requests
+from utils.tracing import traced
 
+# Fan-out limits for WebContextNode's URL fetches and keyword searches
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "8"))
+WEB_PER_HOST = int(os.environ.get("WEB_PER_HOST", "2"))
+# Seconds from submission until a URL summary or search is given up on, time queued behind its host included
+WEB_ITEM_TIMEOUT = float(os.environ.get("WEB_ITEM_TIMEOUT", "60"))
+# "duckduckgo", or "fake" for deterministic offline results
+WEB_SEARCH_BACKEND = os.environ.get("WEB_SEARCH_BACKEND", "duckduckgo")
+
+@traced("web")
 def search_duckduckgo(query, max_results=3):
+    if WEB_SEARCH_BACKEND == "fake":
+        return [f"Fake search result {i + 1} for {query}." for i in range(max_results)]
     with DDGS() as ddgs:
         results = ddgs.text(query)
-        return [r['body'] for r in results][:max_results] 
\ No newline at end of file
+        return [r['body'] for r in results][:max_results]
+
+@traced("web")
+def fetch_page_text(url, timeout=10):
+    resp = requests.get(url, timeout=timeout)
+    soup = BeautifulSoup(resp.text, "html.parser")
+    return soup.get_text(separator="\n")